@@ -1,17 +1,25 @@
 """Entry point for the project."""
 
+from __future__ import annotations
+
 import argparse
-import json
 import logging
 import sys
 from pathlib import Path
 
+from metro.core import network
+from metro.core.cache import FileCache, create_cache
 from metro.core.system import Map, System
+from metro.harvest import mock_server
+from metro.harvest.benchmark import run_benchmark
+from metro.harvest.dump import ingest_dump
 from metro.harvest.wikidata import WikidataCityParser, WikidataParser
 
 __author__ = "Sergey Vartanov"
 __email__ = "me@enzet.ru"
 
+SECONDS_IN_DAY: int = 24 * 60 * 60
+
 
 def main() -> None:
     """Parse arguments and run the program."""
@@ -19,33 +27,374 @@ def main() -> None:
     logging.basicConfig(format="%(levelname)s %(message)s", level=logging.INFO)
 
     parser: argparse.ArgumentParser = argparse.ArgumentParser()
-    parser.add_argument("--system-wikidata-id")
-    parser.add_argument("--station-wikidata-ids", nargs="+")
+
+    # Commands are optional: without a command the transport system is parsed.
+    subparsers = parser.add_subparsers(dest="command")
+
+    migrate_cache_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "migrate-cache",
+        help="convert legacy uncompressed cache entries into compressed ones",
+    )
+    migrate_cache_parser.add_argument("--cache", default=argparse.SUPPRESS)
+
+    cache_stats_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "cache-stats",
+        help="show number of cache entries, their size, hit ratio, and number "
+        "of evicted entries",
+    )
+    cache_stats_parser.add_argument("--cache", default=argparse.SUPPRESS)
+    cache_stats_parser.add_argument(
+        "--cache-backend", default=argparse.SUPPRESS
+    )
+
+    ingest_dump_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "ingest-dump",
+        help="fill cache with transport-related entities of Wikidata dump",
+    )
+    ingest_dump_parser.add_argument(
+        "dump", help="path to `.json`, `.json.gz`, or `.json.bz2` dump"
+    )
+    ingest_dump_parser.add_argument(
+        "--roots",
+        type=int,
+        nargs="*",
+        default=[],
+        help="Wikidata ids of transport systems, their lines are stored",
+    )
+    ingest_dump_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes that decode and filter the dump",
+    )
+    ingest_dump_parser.add_argument("--cache", default=argparse.SUPPRESS)
+    ingest_dump_parser.add_argument(
+        "--cache-backend", default=argparse.SUPPRESS
+    )
+    ingest_dump_parser.add_argument(
+        "--local-languages", nargs="+", default=argparse.SUPPRESS
+    )
+    ingest_dump_parser.add_argument(
+        "--languages", nargs="+", default=argparse.SUPPRESS
+    )
+    ingest_dump_parser.add_argument(
+        "--all-languages", action="store_true", default=argparse.SUPPRESS
+    )
+    ingest_dump_parser.add_argument(
+        "--slim-cache", action="store_true", default=argparse.SUPPRESS
+    )
+
+    benchmark_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "benchmark",
+        help="measure crawl speed against a local mock Wikidata server",
+    )
+    benchmark_parser.add_argument(
+        "--fixtures",
+        help="directory with JSON entities to serve, generate a system if not "
+        "set",
+    )
+    benchmark_parser.add_argument(
+        "--lines", type=int, default=4, help="number of generated lines"
+    )
+    benchmark_parser.add_argument(
+        "--stations",
+        type=int,
+        default=25,
+        help="number of stations of every generated line",
+    )
+    benchmark_parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="server response time in seconds",
+    )
+    benchmark_parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="probability of server error response",
+    )
+    benchmark_parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="probability of `429 Too Many Requests` response",
+    )
+    benchmark_parser.add_argument(
+        "--seed", type=int, help="seed of server failures"
+    )
+    benchmark_parser.add_argument(
+        "--system-wikidata-id", type=int, default=argparse.SUPPRESS
+    )
+    benchmark_parser.add_argument(
+        "--station-wikidata-ids",
+        type=int,
+        nargs="+",
+        default=argparse.SUPPRESS,
+    )
+    benchmark_parser.add_argument(
+        "--concurrency", type=int, default=argparse.SUPPRESS
+    )
+    benchmark_parser.add_argument(
+        "--rate", type=float, default=argparse.SUPPRESS
+    )
+    benchmark_parser.add_argument(
+        "--burst", type=int, default=argparse.SUPPRESS
+    )
+    benchmark_parser.add_argument(
+        "--local-languages", nargs="+", default=argparse.SUPPRESS
+    )
+    benchmark_parser.add_argument(
+        "--languages", nargs="+", default=argparse.SUPPRESS
+    )
+    benchmark_parser.add_argument(
+        "--all-languages", action="store_true", default=argparse.SUPPRESS
+    )
+
+    parser.add_argument("--system-wikidata-id", type=int)
+    parser.add_argument("--station-wikidata-ids", type=int, nargs="+")
     parser.add_argument("--cache", default="cache")
+    parser.add_argument(
+        "--cache-backend", choices=["file", "sqlite"], default="file"
+    )
+    parser.add_argument(
+        "--cache-max-bytes",
+        type=int,
+        help="remove least recently used cache entries above this size",
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=float,
+        help="remove cache entries older than this number of days",
+    )
+    parser.add_argument(
+        "--pin",
+        type=int,
+        nargs="+",
+        default=[],
+        help="Wikidata ids of items that should never be removed from cache",
+    )
+    parser.add_argument(
+        "--local-languages",
+        nargs="+",
+        default=["en"],
+        help="languages spoken in the area of the transport system",
+    )
+    parser.add_argument(
+        "--languages",
+        nargs="+",
+        help="if set, keep names and site links only in these and local "
+        "languages, otherwise keep them in all languages",
+    )
+    parser.add_argument(
+        "--all-languages",
+        action="store_true",
+        help="keep names and site links in all languages, even if "
+        "`--languages` is set",
+    )
+    parser.add_argument(
+        "--slim-cache",
+        action="store_true",
+        help="store only claims with properties used by the parser",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="write output JSON without indentation",
+    )
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="download again cached items that were changed on Wikidata",
+    )
+    parser.add_argument(
+        "--update",
+        nargs="+",
+        default=[],
+        help="regular expressions of station names, station Wikidata ids, or "
+        "line Wikidata ids (e.g. `Q123`), matching stations are requested "
+        "again and replaced in the cache",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue interrupted crawl from the checkpoint in the cache",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="number of concurrent requests, crawl sequentially if not set",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=network.DEFAULT_RATE,
+        help="maximum number of requests per second",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=network.DEFAULT_BURST,
+        help="maximum number of requests sent at once after a pause",
+    )
     arguments = parser.parse_args(sys.argv[1:])
 
+    if arguments.command == "migrate-cache":
+        with FileCache(Path(arguments.cache)) as cache:
+            cache.migrate()
+    elif arguments.command == "ingest-dump":
+        wikidata_parser: WikidataParser = WikidataParser(
+            Path(arguments.cache),
+            cache_backend=arguments.cache_backend,
+            languages=get_languages(arguments),
+            slim=arguments.slim_cache,
+        )
+        with wikidata_parser.cache:
+            ingest_dump(
+                Path(arguments.dump),
+                wikidata_parser,
+                arguments.roots,
+                arguments.workers,
+            )
+    elif arguments.command == "benchmark":
+        given: list[bool] = [
+            arguments.fixtures is not None,
+            arguments.system_wikidata_id is not None,
+            arguments.station_wikidata_ids is not None,
+        ]
+        if any(given) and not all(given):
+            benchmark_parser.error(
+                "--fixtures, --system-wikidata-id, and --station-wikidata-ids "
+                "should be used together"
+            )
+        benchmark(arguments)
+    elif arguments.command == "cache-stats":
+        with create_cache(
+            arguments.cache_backend, Path(arguments.cache)
+        ) as cache:
+            cache.report()
+    else:
+        parse(arguments)
+
+
+def get_languages(arguments: argparse.Namespace) -> list[str] | None:
+    """Get languages to request from Wikidata, `None` for all languages."""
+
+    if arguments.all_languages or arguments.languages is None:
+        return None
+    return [*arguments.languages, *arguments.local_languages]
+
+
+def benchmark(arguments: argparse.Namespace) -> None:
+    """Crawl transport system served by a local mock Wikidata server."""
+
+    system_wikidata_id: int = mock_server.SYSTEM_ID
+    station_wikidata_ids: list[int] = [mock_server.FIRST_STATION_ID]
+    if arguments.fixtures:
+        entities = mock_server.load_fixtures(Path(arguments.fixtures))
+        system_wikidata_id = arguments.system_wikidata_id
+        station_wikidata_ids = arguments.station_wikidata_ids
+    else:
+        entities = mock_server.generate_network(
+            arguments.lines, arguments.stations
+        )
+
+    server: mock_server.MockWikidataServer = mock_server.MockWikidataServer(
+        entities,
+        latency=arguments.latency,
+        error_rate=arguments.error_rate,
+        throttle_rate=arguments.throttle_rate,
+        seed=arguments.seed,
+    )
+    server.start()
+    try:
+        run_benchmark(
+            server,
+            system_wikidata_id,
+            station_wikidata_ids,
+            arguments.concurrency,
+            arguments.rate,
+            arguments.burst,
+            get_languages(arguments),
+        ).report()
+    finally:
+        server.stop()
+
+
+def parse(arguments: argparse.Namespace) -> None:
+    """Parse transport system from Wikidata."""
+
     cache_directory: Path = Path(arguments.cache)
     cache_directory.mkdir(exist_ok=True)
 
-    wikidata_parser: WikidataParser = WikidataParser(cache_directory)
-    map_: Map = Map("metro", {}, {"metro": System({}, "metro")}, ["en"])
-
-    city_parser: WikidataCityParser = WikidataCityParser(
-        wikidata_parser,
-        map_,
-        {int(arguments.system_wikidata_id): "metro"},
-        [int(x) for x in arguments.station_wikidata_ids],
-        int(arguments.system_wikidata_id),
-        [],
+    rate_limiter: network.RateLimiter = network.RateLimiter(
+        arguments.rate, arguments.burst
     )
-    city_parser.parse()
+    session: network.Session = network.Session(
+        max_connections_per_host=arguments.concurrency
+        or network.DEFAULT_MAX_CONNECTIONS_PER_HOST,
+        rate_limiter=rate_limiter,
+    )
+    wikidata_parser: WikidataParser = WikidataParser(
+        cache_directory,
+        session,
+        revalidate=arguments.revalidate,
+        cache_backend=arguments.cache_backend,
+        cache_max_bytes=arguments.cache_max_bytes,
+        cache_max_age=(
+            arguments.cache_max_age * SECONDS_IN_DAY
+            if arguments.cache_max_age is not None
+            else None
+        ),
+        languages=get_languages(arguments),
+        slim=arguments.slim_cache,
+    )
+    # Closing the cache writes data kept in memory, e.g. access times of
+    # SQLite entries.
+    with wikidata_parser.cache:
+        wikidata_parser.pin(arguments.pin)
+        map_: Map = Map(
+            "metro",
+            {},
+            {"metro": System({}, "metro")},
+            arguments.local_languages,
+            None if arguments.all_languages else arguments.languages,
+        )
+
+        city_parser: WikidataCityParser = WikidataCityParser(
+            wikidata_parser,
+            map_,
+            {arguments.system_wikidata_id: "metro"},
+            arguments.station_wikidata_ids,
+            arguments.system_wikidata_id,
+            arguments.update,
+            checkpoint_path=cache_directory
+            / f"checkpoint_{arguments.system_wikidata_id}.json",
+        )
+        city_parser.parse(
+            concurrency=arguments.concurrency, resume=arguments.resume
+        )
+        logging.info(
+            "%d requests, throttled for %.1f s",
+            rate_limiter.request_count,
+            rate_limiter.throttled_time,
+        )
+        wikidata_parser.cache.evict()
+        wikidata_parser.cache.save_stats()
+        wikidata_parser.cache.report()
+        logging.info(
+            "memory: %d hits, %d misses",
+            wikidata_parser.memory_stats.hits,
+            wikidata_parser.memory_stats.misses,
+        )
 
     output_directory: Path = Path("out")
     output_directory.mkdir(parents=True, exist_ok=True)
 
     system: System = map_.systems["metro"]
-    with (output_directory / f"{system.id_}.json").open("w+") as output_file:
-        json.dump(system.serialize(), output_file, indent=4, ensure_ascii=False)
+    system.write(
+        output_directory / f"{system.id_}.json", pretty=not arguments.compact
+    )
 
 
 if __name__ == "__main__":
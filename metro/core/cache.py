@@ -0,0 +1,701 @@
+"""On-disk cache of downloaded data."""
+
+from __future__ import annotations
+
+import contextlib
+import gzip
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import TYPE_CHECKING, TypeVar
+
+from metro.core import json_backend
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+# Number of key characters after the one-letter prefix that define the shard
+# directory.
+SHARD_LENGTH: int = 2
+
+COMPRESSED_SUFFIX: str = ".gz"
+
+SQLITE_FILE_NAME: str = "cache.sqlite"
+
+# File of the cache statistics of all runs, for file caches.
+STATS_FILE_NAME: str = "stats.json"
+
+# Maximum number of SQLite query parameters.
+SQLITE_MAX_PARAMETERS: int = 500
+
+# Access time of SQLite entries is updated only if it is older than this
+# number of seconds, so that reading the cache rarely writes to it.
+ACCESS_TIME_RESOLUTION: float = 60 * 60
+
+# Maximum number of access times of SQLite entries kept in memory before they
+# are written to the database.
+MAX_PENDING_ACCESS_TIMES: int = 10_000
+
+CacheType = TypeVar("CacheType", bound="Cache")
+
+
+@dataclass
+class CacheStats:
+    """Cache usage statistics."""
+
+    hits: int = 0
+    misses: int = 0
+    evicted: int = 0
+
+    def __add__(self, other: CacheStats) -> CacheStats:
+        return CacheStats(
+            self.hits + other.hits,
+            self.misses + other.misses,
+            self.evicted + other.evicted,
+        )
+
+    def get_hit_ratio(self) -> float | None:
+        """Get ratio of requested entries that were found in the cache."""
+        total: int = self.hits + self.misses
+        return self.hits / total if total else None
+
+
+class Cache(ABC):
+    """Key-value storage of downloaded data.
+
+    Cache may be limited by the total size of entries and by their age.
+    Entries older than `max_age` and, if the cache is still larger than
+    `max_bytes`, least recently read entries are removed by `evict`.  Pinned
+    entries are never removed.
+
+    Usage statistics are collected in memory and added to the statistics
+    stored with the cache by `save_stats`, so that they are available to
+    other runs.
+
+    Cache should be closed by `close` or used as a context manager, so that
+    data kept in memory is written.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        max_age: float | None = None,
+        pinned: Iterable[str] = (),
+    ) -> None:
+        """Initialize cache.
+
+        :param max_bytes: maximum total size of entries in bytes
+        :param max_age: maximum age of entries in seconds
+        :param pinned: keys of entries that should never be evicted
+        """
+        self.max_bytes: int | None = max_bytes
+        self.max_age: float | None = max_age
+        self.pinned: set[str] = set(pinned)
+        self.stats: CacheStats = CacheStats()
+        self.stats_lock: threading.Lock = threading.Lock()
+
+    def read(self, key: str) -> bytes | None:
+        """Get entry content or `None` if there is no such entry."""
+        return self.read_many([key]).get(key)
+
+    def read_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        """Get contents of all existing entries with the specified keys.
+
+        Access time of the found entries is updated.
+        """
+        keys = list(keys)
+        result: dict[str, bytes] = self._read_many(keys)
+        with self.stats_lock:
+            self.stats.hits += len(result)
+            self.stats.misses += len(keys) - len(result)
+        return result
+
+    @abstractmethod
+    def _read_many(self, keys: list[str]) -> dict[str, bytes]:
+        """Get contents of existing entries and update their access time."""
+
+    @abstractmethod
+    def contains(self, key: str) -> bool:
+        """Check whether the entry exists."""
+
+    @abstractmethod
+    def write(
+        self, key: str, content: bytes, revision: int | None = None
+    ) -> None:
+        """Add or replace entry.
+
+        :param key: entry key
+        :param content: entry content
+        :param revision: revision of the entry content if it is known, stored
+            by caches that can index it, see `read_revisions`
+        """
+
+    def read_revisions(self, keys: Iterable[str]) -> dict[str, int]:
+        """Get stored revisions of existing entries without reading them.
+
+        Access time of the entries is not updated.
+
+        :return: revisions mapped from keys of entries whose revisions are
+            stored, empty if the cache does not store revisions
+        """
+        del keys
+        return {}
+
+    @abstractmethod
+    def touch(self, keys: Iterable[str]) -> None:
+        """Set fetch time of existing entries to the current time.
+
+        It is used for entries that are confirmed to be up to date, so that
+        they are not removed as expired.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove entry if it exists."""
+
+    @abstractmethod
+    def keys(self) -> Iterator[str]:
+        """Iterate over keys of all entries."""
+
+    @abstractmethod
+    def get_entries(self) -> list[tuple[str, int, float, float]]:
+        """Get key, size, fetch time, and access time of all entries."""
+
+    def get_size(self) -> tuple[int, int]:
+        """Get number of entries and their total size in bytes."""
+
+        entries: list[tuple[str, int, float, float]] = self.get_entries()
+        return len(entries), sum(x[1] for x in entries)
+
+    def evict(self) -> int:
+        """Remove expired entries and then least recently read entries.
+
+        :return: number of removed entries
+        """
+        if self.max_age is None and self.max_bytes is None:
+            return 0
+
+        entries: list[tuple[str, int, float, float]] = self.get_entries()
+        # Pinned entries are never removed, but they still take space.
+        total_size: int = sum(x[1] for x in entries)
+        entries = [x for x in entries if x[0] not in self.pinned]
+        to_remove: list[str] = []
+
+        if self.max_age is not None:
+            now: float = time.time()
+            for key, size, fetched, _ in entries:
+                if now - fetched > self.max_age:
+                    to_remove.append(key)
+                    total_size -= size
+
+        if self.max_bytes is not None:
+            expired: set[str] = set(to_remove)
+            for key, size, _, _ in sorted(entries, key=lambda x: x[3]):
+                if total_size <= self.max_bytes:
+                    break
+                if key not in expired:
+                    to_remove.append(key)
+                    total_size -= size
+
+        for key in to_remove:
+            self.delete(key)
+
+        with self.stats_lock:
+            self.stats.evicted += len(to_remove)
+        return len(to_remove)
+
+    @abstractmethod
+    def read_stored_stats(self) -> CacheStats:
+        """Get statistics of previous runs stored by `save_stats`."""
+
+    @abstractmethod
+    def _add_stored_stats(self, stats: CacheStats) -> None:
+        """Add statistics to the stored ones."""
+
+    def save_stats(self) -> None:
+        """Add statistics of this run to the stored ones and reset them."""
+
+        with self.stats_lock:
+            stats: CacheStats = self.stats
+            self.stats = CacheStats()
+        if stats != CacheStats():
+            self._add_stored_stats(stats)
+
+    def get_total_stats(self) -> CacheStats:
+        """Get statistics of all runs, including not saved ones."""
+
+        with self.stats_lock:
+            stats: CacheStats = CacheStats() + self.stats
+        return self.read_stored_stats() + stats
+
+    def close(self) -> None:  # noqa: B027
+        """Write data kept in memory and release resources of the cache."""
+
+    def __enter__(self: CacheType) -> CacheType:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def report(self) -> None:
+        """Log cache size and statistics of all runs."""
+
+        count, size = self.get_size()
+        stats: CacheStats = self.get_total_stats()
+        hit_ratio: float | None = stats.get_hit_ratio()
+        logging.info(
+            "cache: %d entries, %.1f MiB, hit ratio %s, %d evicted",
+            count,
+            size / 1024 / 1024,
+            "n/a" if hit_ratio is None else f"{hit_ratio:.1%}",
+            stats.evicted,
+        )
+
+
+def write_atomically(path: Path, content: bytes) -> None:
+    """Write file under a unique temporary name and then rename it.
+
+    Concurrent readers never see partially written files, and concurrent
+    writers of the same file, in one or several processes, never share the
+    temporary file: the last one wins.
+    """
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+    ) as output_file:
+        output_file.write(content)
+    Path(output_file.name).replace(path)
+
+
+def is_legacy_entry(path: Path) -> bool:
+    """Check whether the file is a legacy uncompressed cache entry.
+
+    Legacy entries have no extension, so other files, e.g. SQLite database,
+    are never treated as entries.
+    """
+    return path.is_file() and "." not in path.name
+
+
+class FileCache(Cache):
+    """Cache that stores every entry as a compressed file.
+
+    Files are grouped into shard directories by key prefix, so that no
+    directory contains too many files: entry `Q12345` is stored in
+    `12/Q12345.gz`.  The one-letter prefix is not a part of the shard name,
+    so shard directories never clash with legacy uncompressed entries stored
+    directly in the cache directory (e.g. `Q12345`), which are read
+    transparently.
+
+    File modification time is the fetch time of the entry, and file access
+    time is explicitly set on every read, so it does not depend on file system
+    mount options.
+
+    Entries may be read, written, and deleted by several threads or processes
+    at the same time: entries deleted during the read are treated as missing.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int | None = None,
+        max_age: float | None = None,
+        pinned: Iterable[str] = (),
+    ) -> None:
+        super().__init__(max_bytes, max_age, pinned)
+        self.directory: Path = directory
+
+    def get_path(self, key: str) -> Path:
+        """Get path to the compressed file of the entry."""
+        # Key suffix after a dot, e.g. a variant of the entry, does not
+        # affect the shard, so all variants of the entry are stored together.
+        shard: str = key.split(".", 1)[0][1 : 1 + SHARD_LENGTH]
+        return self.directory / shard / (key + COMPRESSED_SUFFIX)
+
+    def get_legacy_path(self, key: str) -> Path:
+        """Get path to the legacy uncompressed file of the entry."""
+        return self.directory / key
+
+    def _read_many(self, keys: list[str]) -> dict[str, bytes]:
+        """Read compressed or legacy files and set their access time."""
+
+        result: dict[str, bytes] = {}
+        now: float = time.time()
+
+        for key in keys:
+            path: Path = self.get_path(key)
+            content: bytes | None = None
+            try:
+                content = gzip.decompress(path.read_bytes())
+            except FileNotFoundError:
+                path = self.get_legacy_path(key)
+                if path.is_file():
+                    with contextlib.suppress(FileNotFoundError):
+                        content = path.read_bytes()
+            if content is None:
+                continue
+            result[key] = content
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(path, (now, path.stat().st_mtime))
+
+        return result
+
+    def contains(self, key: str) -> bool:
+        """Check whether compressed or legacy file of the entry exists."""
+        return self.get_path(key).exists() or (
+            self.get_legacy_path(key).is_file()
+        )
+
+    def write(
+        self,
+        key: str,
+        content: bytes,
+        revision: int | None = None,  # noqa: ARG002
+    ) -> None:
+        """Add or replace entry.
+
+        The file is written atomically, so the entry may be written by several
+        threads or processes at the same time.
+        """
+        path: Path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomically(path, gzip.compress(content, mtime=0))
+
+        legacy_path: Path = self.get_legacy_path(key)
+        if legacy_path.is_file():
+            legacy_path.unlink()
+
+    def touch(self, keys: Iterable[str]) -> None:
+        """Set modification time of compressed or legacy files."""
+
+        now: float = time.time()
+        for key in keys:
+            for path in self.get_path(key), self.get_legacy_path(key):
+                if path.is_file():
+                    with contextlib.suppress(FileNotFoundError):
+                        os.utime(path, (path.stat().st_atime, now))
+                    break
+
+    def delete(self, key: str) -> None:
+        """Remove compressed and legacy files of the entry."""
+        self.get_path(key).unlink(missing_ok=True)
+        if (legacy_path := self.get_legacy_path(key)).is_file():
+            legacy_path.unlink(missing_ok=True)
+
+    def get_paths(self) -> Iterator[tuple[str, Path]]:
+        """Iterate over keys and file paths of compressed and legacy entries."""
+
+        if not self.directory.exists():
+            return
+
+        path: Path
+        for path in self.directory.glob(f"*/*{COMPRESSED_SUFFIX}"):
+            yield path.name[: -len(COMPRESSED_SUFFIX)], path
+        for path in self.directory.iterdir():
+            if is_legacy_entry(path):
+                yield path.name, path
+
+    def keys(self) -> Iterator[str]:
+        """Iterate over keys of compressed and legacy entries."""
+        for key, _ in self.get_paths():
+            yield key
+
+    def get_entries(self) -> list[tuple[str, int, float, float]]:
+        """Get key, size, fetch time, and access time from file statuses."""
+
+        entries: list[tuple[str, int, float, float]] = []
+        for key, path in self.get_paths():
+            status: os.stat_result = path.stat()
+            entries.append(
+                (key, status.st_size, status.st_mtime, status.st_atime)
+            )
+        return entries
+
+    def get_stats_path(self) -> Path:
+        """Get path to the file of stored statistics."""
+        return self.directory / STATS_FILE_NAME
+
+    def read_stored_stats(self) -> CacheStats:
+        """Read statistics from the statistics file if it exists."""
+
+        path: Path = self.get_stats_path()
+        if not path.is_file():
+            return CacheStats()
+        return CacheStats(**json_backend.loads(path.read_bytes()))
+
+    def _add_stored_stats(self, stats: CacheStats) -> None:
+        """Replace the statistics file.
+
+        If several processes save statistics at the same time, statistics of
+        some of them may be lost.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_atomically(
+            self.get_stats_path(),
+            json_backend.dumps(asdict(self.read_stored_stats() + stats)),
+        )
+
+    def migrate(self) -> int:
+        """Convert all legacy uncompressed entries into compressed ones.
+
+        Fetch and access times of the entries are preserved.
+
+        :return: number of converted entries
+        """
+        count: int = 0
+
+        path: Path
+        for path in list(self.directory.iterdir()):
+            if not is_legacy_entry(path):
+                continue
+            status: os.stat_result = path.stat()
+            self.write(path.name, path.read_bytes())
+            os.utime(
+                self.get_path(path.name), (status.st_atime, status.st_mtime)
+            )
+            count += 1
+
+        logging.info("%d entries converted", count)
+        return count
+
+
+class SQLiteCache(Cache):
+    """Cache that stores all entries in one SQLite database.
+
+    Every entry is a row with its key, revision, fetch and access times, and
+    zlib-compressed content.  The database uses write-ahead logging, so
+    several processes may read it while one of them writes.  One cache object
+    may be used from several threads.
+
+    Reading entries does not write to the database: access times are kept in
+    memory and written all at once by `flush`, when too many of them are
+    kept, when entries are listed for eviction, or when the cache is closed.
+    Access times are only updated if they are older than
+    `ACCESS_TIME_RESOLUTION`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int | None = None,
+        max_age: float | None = None,
+        pinned: Iterable[str] = (),
+    ) -> None:
+        super().__init__(max_bytes, max_age, pinned)
+        self.path: Path = path
+        self.lock: threading.Lock = threading.Lock()
+
+        # Access times of read entries not written to the database yet.
+        self.access_times: dict[str, float] = {}
+
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path, check_same_thread=False
+        )
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "id TEXT PRIMARY KEY, "
+                "revision INTEGER, "
+                "fetched REAL NOT NULL, "
+                "payload BLOB NOT NULL, "
+                "accessed REAL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS stats ("
+                "name TEXT PRIMARY KEY, "
+                "value INTEGER NOT NULL)"
+            )
+            columns: set[str] = {
+                x[1]
+                for x in self.connection.execute("PRAGMA table_info(entries)")
+            }
+            # Databases created before access time was recorded.
+            if "accessed" not in columns:
+                self.connection.execute(
+                    "ALTER TABLE entries ADD COLUMN accessed REAL"
+                )
+
+    def _read_many(self, keys: list[str]) -> dict[str, bytes]:
+        """Select entries with one query per 500 keys.
+
+        Access times of the entries are kept in memory, see `flush`.
+        """
+        result: dict[str, bytes] = {}
+        now: float = time.time()
+        is_flush_needed: bool = False
+
+        for index in range(0, len(keys), SQLITE_MAX_PARAMETERS):
+            batch: list[str] = keys[index : index + SQLITE_MAX_PARAMETERS]
+            condition: str = f"id IN ({', '.join('?' * len(batch))})"
+            with self.lock:
+                rows: list[tuple[str, bytes, float | None]] = (
+                    self.connection.execute(
+                        "SELECT id, payload, accessed FROM entries "  # noqa: S608
+                        f"WHERE {condition}",
+                        batch,
+                    ).fetchall()
+                )
+                for key, _, accessed in rows:
+                    if accessed is None or now - accessed > (
+                        ACCESS_TIME_RESOLUTION
+                    ):
+                        self.access_times[key] = now
+                is_flush_needed = (
+                    len(self.access_times) >= MAX_PENDING_ACCESS_TIMES
+                )
+            for key, payload, _ in rows:
+                result[key] = zlib.decompress(payload)
+
+        if is_flush_needed:
+            self.flush()
+        return result
+
+    def flush(self) -> None:
+        """Write access times of read entries to the database."""
+
+        with self.lock:
+            if not self.access_times:
+                return
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE entries SET accessed = ? WHERE id = ?",
+                    [(y, x) for x, y in self.access_times.items()],
+                )
+            self.access_times = {}
+
+    def read_revisions(self, keys: Iterable[str]) -> dict[str, int]:
+        """Select stored revisions with one query per 500 keys."""
+
+        keys = list(keys)
+        result: dict[str, int] = {}
+
+        for index in range(0, len(keys), SQLITE_MAX_PARAMETERS):
+            batch: list[str] = keys[index : index + SQLITE_MAX_PARAMETERS]
+            condition: str = f"id IN ({', '.join('?' * len(batch))})"
+            with self.lock:
+                rows: list[tuple[str, int]] = self.connection.execute(
+                    f"SELECT id, revision FROM entries WHERE {condition} "  # noqa: S608
+                    "AND revision IS NOT NULL",
+                    batch,
+                ).fetchall()
+            result |= dict(rows)
+
+        return result
+
+    def contains(self, key: str) -> bool:
+        """Check whether the database has the entry."""
+        with self.lock:
+            return (
+                self.connection.execute(
+                    "SELECT 1 FROM entries WHERE id = ?", (key,)
+                ).fetchone()
+                is not None
+            )
+
+    def write(
+        self, key: str, content: bytes, revision: int | None = None
+    ) -> None:
+        """Add or replace entry with its revision and current time."""
+        now: float = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(id, revision, fetched, payload, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, revision, now, zlib.compress(content), now),
+            )
+
+    def touch(self, keys: Iterable[str]) -> None:
+        """Update fetch time with one query per 500 keys."""
+
+        keys = list(keys)
+        now: float = time.time()
+
+        for index in range(0, len(keys), SQLITE_MAX_PARAMETERS):
+            batch: list[str] = keys[index : index + SQLITE_MAX_PARAMETERS]
+            condition: str = f"id IN ({', '.join('?' * len(batch))})"
+            with self.lock, self.connection:
+                self.connection.execute(
+                    f"UPDATE entries SET fetched = ? WHERE {condition}",  # noqa: S608
+                    [now, *batch],
+                )
+
+    def delete(self, key: str) -> None:
+        """Remove entry from the database."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM entries WHERE id = ?", (key,))
+
+    def keys(self) -> Iterator[str]:
+        """Iterate over keys of all entries in the database."""
+        with self.lock:
+            rows: list[tuple[str]] = self.connection.execute(
+                "SELECT id FROM entries"
+            ).fetchall()
+        for (key,) in rows:
+            yield key
+
+    def get_entries(self) -> list[tuple[str, int, float, float]]:
+        """Get key, compressed size, fetch time, and access time of entries."""
+        self.flush()
+        with self.lock:
+            return self.connection.execute(
+                "SELECT id, LENGTH(payload), fetched, "
+                "COALESCE(accessed, fetched) FROM entries"
+            ).fetchall()
+
+    def read_stored_stats(self) -> CacheStats:
+        """Select statistics from the database."""
+        with self.lock:
+            rows: list[tuple[str, int]] = self.connection.execute(
+                "SELECT name, value FROM stats"
+            ).fetchall()
+        names: set[str] = {x.name for x in fields(CacheStats)}
+        return CacheStats(**{x: y for x, y in rows if x in names})
+
+    def _add_stored_stats(self, stats: CacheStats) -> None:
+        """Add statistics to the database values in one transaction."""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) "
+                "DO UPDATE SET value = value + excluded.value",
+                list(asdict(stats).items()),
+            )
+
+    def close(self) -> None:
+        """Write access times of read entries and close the database."""
+        self.flush()
+        self.connection.close()
+
+
+def create_cache(
+    backend: str,
+    directory: Path,
+    max_bytes: int | None = None,
+    max_age: float | None = None,
+) -> Cache:
+    """Create cache of the specified type.
+
+    :param backend: `file` for compressed files or `sqlite` for SQLite
+        database
+    :param directory: directory to store the cache in
+    :param max_bytes: maximum total size of entries in bytes
+    :param max_age: maximum age of entries in seconds
+    """
+    if backend == "file":
+        return FileCache(directory, max_bytes, max_age)
+    if backend == "sqlite":
+        directory.mkdir(parents=True, exist_ok=True)
+        return SQLiteCache(directory / SQLITE_FILE_NAME, max_bytes, max_age)
+
+    message: str = f"unknown cache backend `{backend}`"
+    raise ValueError(message)
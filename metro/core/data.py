@@ -10,12 +10,65 @@ import logging
 import re
 from datetime import date
 from enum import Enum
-from typing import Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
 
 __author__ = "Sergey Vartanov"
 __email__ = "me@enzet.ru"
 
 
+# Maximum number of memoized name extraction results per pattern registry.
+NAME_CACHE_SIZE: int = 65_536
+
+
+class NamePatterns:
+    """Registry of compiled patterns that extract names from captions.
+
+    Every pattern has a `name` group.  Patterns of a language are tried in the
+    registration order, and the `name` group of the first matched pattern is
+    the result.  Results are memoized by caption and language.
+    """
+
+    def __init__(self, patterns: dict[str, list[str]]) -> None:
+        """Compile patterns.
+
+        :param patterns: pattern strings mapped from language identifiers; the
+            registry keeps it updated when new patterns are registered
+        """
+        self.patterns: dict[str, list[str]] = patterns
+        self.compiled: dict[str, list[re.Pattern]] = {
+            language: [re.compile(x) for x in language_patterns]
+            for language, language_patterns in patterns.items()
+        }
+        self.extract: Callable[[str, str], str] = lru_cache(
+            maxsize=NAME_CACHE_SIZE
+        )(self._extract)
+
+    def _extract(self, name: str, language: str) -> str:
+        """Get name from the caption, or the caption if no pattern matches."""
+
+        pattern: re.Pattern
+        for pattern in self.compiled.get(language, ()):
+            if matcher := pattern.match(name):
+                return matcher.group("name")
+        return name
+
+    def register(self, language: str, patterns: Iterable[str]) -> None:
+        """Add patterns for the language, tried after the existing ones.
+
+        Memoized results are dropped, because they may change.
+        """
+        patterns = list(patterns)
+        self.patterns.setdefault(language, []).extend(patterns)
+        self.compiled.setdefault(language, []).extend(
+            re.compile(x) for x in patterns
+        )
+        self.extract.cache_clear()
+
+
 EN_SYSTEM_TYPE: str = (
     "[Mm]etro|London [Uu]nderground|[Uu]nderground|[Tt]ube|[Ss]ubway|[Rr]ailway"
 )
@@ -66,6 +119,9 @@ station_name_dict: dict[str, list[str]] = {
 }
 
 
+station_name_patterns: NamePatterns = NamePatterns(station_name_dict)
+
+
 def extract_station_name(name: str, language: str) -> str:
     """Get station name from its caption.
 
@@ -77,13 +133,7 @@ def extract_station_name(name: str, language: str) -> str:
     :param language: language of the name
     :return: station name
     """
-    name = name.replace("&", "and")
-
-    if language in station_name_dict:
-        for pattern in station_name_dict[language]:
-            if m := re.match(pattern, name):
-                return m.group("name")
-    return name
+    return station_name_patterns.extract(name.replace("&", "and"), language)
 
 
 def compute_short_station_id(
@@ -124,6 +174,9 @@ line_name_dict: dict[str, list[str]] = {
 }
 
 
+line_name_patterns: NamePatterns = NamePatterns(line_name_dict)
+
+
 def extract_line_name(name: str, language: str) -> str:
     """Try to remove all specifiers from the line caption.
 
@@ -131,12 +184,7 @@ def extract_line_name(name: str, language: str) -> str:
     :param language: language of the name
     :return: pure line caption
     """
-    if language in line_name_dict:
-        for pattern in line_name_dict[language]:
-            if matcher := re.match(pattern, name):
-                return matcher.group("name")
-
-    return name
+    return line_name_patterns.extract(name, language)
 
 
 def compute_line_id(
@@ -0,0 +1,162 @@
+"""Transport system graph as NumPy arrays.
+
+Stations are numbered in the order of the system, and connections are stored
+in compressed sparse row (CSR) form: connections of station `i` are
+`indices[indptr[i]:indptr[i + 1]]`, in the order of `Station.connections`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from metro.core.station import ConnectionType
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from metro.core.station import Station
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+# Connection types in the order of their codes in `SystemArrays.types`.
+CONNECTION_TYPES: tuple[ConnectionType, ...] = tuple(ConnectionType)
+CONNECTION_TYPE_CODES: dict[ConnectionType, int] = {
+    x: code for code, x in enumerate(CONNECTION_TYPES)
+}
+
+
+@dataclass
+class SystemArrays:
+    """Stations and connections of a transport system as NumPy arrays."""
+
+    # Station identifiers in the order of station indices.
+    station_ids: np.ndarray
+
+    # Positions of station connections in `indices` and `types`: connections
+    # of station `i` are from `indptr[i]` to `indptr[i + 1]`.
+    indptr: np.ndarray
+
+    # Indices of stations connections lead to.
+    indices: np.ndarray
+
+    # Connection type codes, see `CONNECTION_TYPES`.
+    types: np.ndarray
+
+    # Latitude and longitude of stations, `NaN` if unknown.
+    coordinates: np.ndarray
+
+    # Altitude of stations, `NaN` if unknown.
+    altitudes: np.ndarray
+
+    # Station indices mapped from station identifiers.
+    station_index: dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.station_index = {
+            str(x): index for index, x in enumerate(self.station_ids)
+        }
+
+    @classmethod
+    def from_stations(cls, stations: list[Station]) -> SystemArrays:
+        """Construct arrays from stations.
+
+        Connections to stations that are not in the list are skipped.
+        """
+        station_index: dict[int, int] = {
+            id(x): index for index, x in enumerate(stations)
+        }
+        indptr: np.ndarray = np.zeros(len(stations) + 1, dtype=np.int64)
+        indices: list[int] = []
+        types: list[int] = []
+        coordinates: np.ndarray = np.full((len(stations), 2), np.nan)
+        altitudes: np.ndarray = np.full(len(stations), np.nan)
+
+        for index, station in enumerate(stations):
+            for connection in station.connections:
+                target: int | None = station_index.get(id(connection.to_))
+                if target is not None:
+                    indices.append(target)
+                    types.append(CONNECTION_TYPE_CODES[connection.type_])
+            indptr[index + 1] = len(indices)
+            if station.geo_position is not None:
+                coordinates[index] = station.geo_position
+            if station.altitude is not None:
+                altitudes[index] = station.altitude
+
+        return cls(
+            station_ids=np.array([x.id_ for x in stations], dtype=np.str_),
+            indptr=indptr,
+            indices=np.array(indices, dtype=np.int64),
+            types=np.array(types, dtype=np.uint8),
+            coordinates=coordinates,
+            altitudes=altitudes,
+        )
+
+    def get_connection_types(self, index: int) -> list[ConnectionType]:
+        """Get types of connections of the station with the index."""
+
+        return [
+            CONNECTION_TYPES[x]
+            for x in self.types[self.indptr[index] : self.indptr[index + 1]]
+        ]
+
+    def get_neighbours(self, index: int) -> np.ndarray:
+        """Get indices of stations connected to the station with the index."""
+
+        return self.indices[self.indptr[index] : self.indptr[index + 1]]
+
+    def save(self, path: Path) -> None:
+        """Write arrays to `.npz` file.
+
+        Connection type names are written together with the codes, so that
+        the file may be read after `ConnectionType` changes.
+        """
+        np.savez_compressed(
+            path,
+            station_ids=self.station_ids,
+            indptr=self.indptr,
+            indices=self.indices,
+            types=self.types,
+            type_names=np.array(
+                [x.value for x in CONNECTION_TYPES], dtype=np.str_
+            ),
+            coordinates=self.coordinates,
+            altitudes=self.altitudes,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> SystemArrays:
+        """Read arrays from `.npz` file written by `save`.
+
+        Connection type codes are mapped to the current `CONNECTION_TYPES`.
+
+        :raises ValueError: if the file has no connection type names or has
+            unknown ones
+        """
+        with np.load(path) as arrays:
+            if "type_names" not in arrays.files:
+                message: str = f"no connection type names in `{path}`"
+                raise ValueError(message)
+
+            current_codes: dict[str, int] = {
+                x.value: code for x, code in CONNECTION_TYPE_CODES.items()
+            }
+            codes: list[int] = []
+            for name in arrays["type_names"].tolist():
+                if name not in current_codes:
+                    message = f"unknown connection type `{name}` in `{path}`"
+                    raise ValueError(message)
+                codes.append(current_codes[name])
+
+            return cls(
+                station_ids=arrays["station_ids"],
+                indptr=arrays["indptr"],
+                indices=arrays["indices"],
+                types=np.array(codes, dtype=np.uint8)[arrays["types"]],
+                coordinates=arrays["coordinates"],
+                altitudes=arrays["altitudes"],
+            )
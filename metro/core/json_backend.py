@@ -0,0 +1,50 @@
+"""JSON decoding and encoding.
+
+If `orjson` is installed (`pip install metro[fast]`), it is used for decoding
+and compact encoding, otherwise the standard library is used.  Both backends
+give the same values and accept bytes directly.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+# Indentation of pretty output.
+PRETTY_INDENT: int = 4
+
+# Name of the used backend: `orjson` or `json`.
+backend: str = "json" if orjson is None else "orjson"
+
+
+def loads(content: bytes | str) -> Any:  # noqa: ANN401
+    """Decode JSON document without decoding bytes to a string first."""
+
+    if backend == "orjson":
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dumps(value: Any, *, pretty: bool = False) -> bytes:  # noqa: ANN401
+    """Encode value as UTF-8 JSON document.
+
+    :param value: value with string dictionary keys
+    :param pretty: indent nested values, otherwise omit all whitespace
+    """
+    if pretty:
+        # `orjson` supports only 2-space indentation, so that pretty output
+        # does not depend on the backend.
+        return json.dumps(
+            value, indent=PRETTY_INDENT, ensure_ascii=False
+        ).encode()
+    if backend == "orjson":
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
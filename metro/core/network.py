@@ -2,35 +2,284 @@
 
 from __future__ import annotations
 
+import logging
+import threading
 import time
-from typing import TYPE_CHECKING
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Callable
 
 import urllib3
 
+from metro import __project__, __url__, __version__
+
 if TYPE_CHECKING:
     from pathlib import Path
 
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+USER_AGENT: str = f"{__project__}/{__version__} ({__url__})"
+
+# Default maximum number of simultaneously open connections to one host.
+DEFAULT_MAX_CONNECTIONS_PER_HOST: int = 4
+
+# Default number of requests per second and the number of requests that may be
+# sent at once after a pause.
+DEFAULT_RATE: float = 1.0
+DEFAULT_BURST: int = 1
+
+# HTTP statuses that mean that the server wants us to slow down.
+THROTTLING_STATUSES: set[int] = {429, 503}
+
+# Maximum number of attempts of one request if the server asks to retry later.
+MAX_ATTEMPTS: int = 5
+
+
+class RateLimiter:
+    """Token bucket that limits the request rate of all its callers.
+
+    The bucket is refilled with `rate` tokens per second up to `burst` tokens,
+    and every request takes one token.  If the server asks to slow down, the
+    limiter blocks all callers for the requested time or, if no time is
+    requested, for exponentially growing time.  The limiter is thread-safe.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_back_off: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize rate limiter.
+
+        :param rate: number of requests per second
+        :param burst: maximum number of requests that may be sent at once
+        :param max_back_off: maximum time in seconds to block callers for if
+            the server does not tell how long to wait
+        :param clock: monotonic time function
+        :param sleep: function to wait for the specified number of seconds
+        """
+        self.rate: float = rate
+        self.burst: int = burst
+        self.max_back_off: float = max_back_off
+        self.clock: Callable[[], float] = clock
+        self.sleep: Callable[[float], None] = sleep
+
+        self.tokens: float = burst
+        # Time of the last bucket refill, it may be in the future if callers
+        # are blocked.
+        self.updated: float = clock()
+        self.back_off_time: float = 0.0
+
+        # Total time in seconds callers waited for.
+        self.throttled_time: float = 0.0
+        self.request_count: int = 0
+
+        self.lock: threading.Lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Wait until the request may be sent.
+
+        :return: waited time in seconds
+        """
+        with self.lock:
+            now: float = self.clock()
+            if now > self.updated:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+            # Reserve a token, even if it will be available only in the future.
+            self.tokens -= 1
+            wait: float = max(
+                0.0, self.updated + max(0.0, -self.tokens) / self.rate - now
+            )
+            self.throttled_time += wait
+            self.request_count += 1
+
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def back_off(self, delay: float | None = None) -> None:
+        """Block all callers after the server asked to slow down.
+
+        :param delay: time in seconds requested by the server; if `None`, wait
+            for twice as long as the previous time
+        """
+        with self.lock:
+            if delay is None:
+                self.back_off_time = min(
+                    self.max_back_off, max(1.0, self.back_off_time * 2.0)
+                )
+                delay = self.back_off_time
+            self.updated = max(self.updated, self.clock() + delay)
+            # Allow exactly one request right after the pause.
+            self.tokens = 1.0
+
+    def report_success(self) -> None:
+        """Reset exponential back-off after a successful request."""
+        with self.lock:
+            self.back_off_time = 0.0
+
+
+_default_rate_limiter: RateLimiter | None = None
+
+
+def get_default_rate_limiter() -> RateLimiter:
+    """Get rate limiter shared by all sessions that do not provide their own."""
+
+    global _default_rate_limiter  # noqa: PLW0603
+    if _default_rate_limiter is None:
+        _default_rate_limiter = RateLimiter()
+    return _default_rate_limiter
+
+
+def get_retry_delay(response: urllib3.HTTPResponse) -> float | None:
+    """Get time to wait before retrying the request.
+
+    :return: `None` if the request should not be retried, `0` if it should be
+        retried but the server did not tell when, or the number of seconds
+        from the `Retry-After` header
+    """
+    if (
+        response.status not in THROTTLING_STATUSES
+        # MediaWiki API returns maxlag error with 200 status.
+        and response.headers.get("MediaWiki-API-Error") != "maxlag"
+    ):
+        return None
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class Session:
+    """Pool of keep-alive connections shared between requests.
+
+    Connections are reused across calls, so only the first request to a host
+    pays for TCP and TLS setup.  Responses are requested compressed and are
+    decompressed transparently.  All requests go through the rate limiter.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+        max_hosts: int = 10,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        """Initialize session.
+
+        :param max_connections_per_host: maximum number of simultaneously open
+            connections to one host; callers wait for a free connection if
+            all of them are in use
+        :param max_hosts: maximum number of hosts to keep connections to
+        :param rate_limiter: rate limiter for all requests of the session; if
+            `None`, the default rate limiter shared by all sessions is used
+        """
+        self.max_connections_per_host: int = max_connections_per_host
+        self.rate_limiter: RateLimiter = (
+            rate_limiter if rate_limiter else get_default_rate_limiter()
+        )
+        self.pool: urllib3.PoolManager = urllib3.PoolManager(
+            num_pools=max_hosts,
+            maxsize=max_connections_per_host,
+            block=True,
+            # Throttling responses are retried by `request` through the rate
+            # limiter, not by urllib3 itself.
+            retries=urllib3.Retry(
+                urllib3.Retry.DEFAULT.total, respect_retry_after_header=False
+            ),
+            headers=urllib3.make_headers(
+                accept_encoding=True, user_agent=USER_AGENT
+            ),
+        )
+
+    def request(
+        self, address: str, parameters: dict[str, str]
+    ) -> urllib3.HTTPResponse | None:
+        """Send GET request.
+
+        The request waits for the rate limiter and is retried if the server
+        asks to slow down.
+
+        :return: response with decompressed data or `None` if the request
+            failed
+        """
+        for _ in range(MAX_ATTEMPTS):
+            self.rate_limiter.acquire()
+            try:
+                response: urllib3.HTTPResponse = self.pool.request(
+                    "GET", address, parameters
+                )
+            except urllib3.exceptions.MaxRetryError:
+                return None
+
+            delay: float | None = get_retry_delay(response)
+            if delay is None:
+                self.rate_limiter.report_success()
+                return response
+
+            logging.warning(
+                "server asked to slow down (status %s), retrying",
+                response.status,
+            )
+            self.rate_limiter.back_off(delay if delay > 0 else None)
+
+        return None
+
+    def close(self) -> None:
+        """Close all open connections."""
+        self.pool.clear()
+
+
+_default_session: Session | None = None
+
+
+def get_default_session() -> Session:
+    """Get session shared by all callers that do not provide their own."""
+
+    global _default_session  # noqa: PLW0603
+    if _default_session is None:
+        _default_session = Session()
+    return _default_session
+
 
 def get(
-    address: str, parameters: dict[str, str], cache_file: Path
+    address: str,
+    parameters: dict[str, str],
+    cache_file: Path | None = None,
+    session: Session | None = None,
 ) -> bytes | None:
-    """Get data from the network."""
+    """Get data from the network.
+
+    :param address: requested address
+    :param parameters: request parameters
+    :param cache_file: file to read the data from if it exists or to write
+        the data to otherwise; if `None`, the data is not cached
+    :param session: session to send the request with; if `None`, the default
+        session is used
+    """
 
-    if cache_file.exists():
+    if cache_file is not None and cache_file.exists():
         with cache_file.open("rb") as input_file:
             return input_file.read()
 
-    pool: urllib3.PoolManager = urllib3.PoolManager()
+    if session is None:
+        session = get_default_session()
 
-    try:
-        result = pool.request("GET", address, parameters)
-    except urllib3.exceptions.MaxRetryError:
+    result: urllib3.HTTPResponse | None = session.request(address, parameters)
+    if result is None:
+        return None
+    if result.status >= HTTPStatus.BAD_REQUEST:
+        logging.warning("request failed with status %d", result.status)
         return None
 
-    time.sleep(1)
-
-    pool.clear()
     if result.data:
+        if cache_file is None:
+            return result.data
         with cache_file.open("wb+") as output_file:
             output_file.write(result.data)
         return result.data
@@ -37,6 +37,8 @@ class Station(Named):
     structure_type: StationStructure | None = None
     geo_position: tuple[float, float] | None = None
     caption: str | None = None
+    # Connections in the order they were added.  The list is indexed, so it
+    # should be changed with `add_connection` and `remove_connection` only.
     connections: list[Connection] = field(default_factory=list)
     status: dict[str, str] = field(default_factory=dict)
     platform_length: float | None = None
@@ -44,6 +46,15 @@ class Station(Named):
     wikidata_id: int | None = None
     line: Line | None = None
 
+    def __post_init__(self) -> None:
+        # Connections mapped from identities of the stations they lead to.
+        # It is not a dataclass field, so it is neither serialized nor
+        # compared.  If there are several connections to one station, the
+        # first one is found, the same as with `add_connection`.
+        self._connection_index: dict[int, Connection] = {}
+        for connection in self.connections:
+            self._connection_index.setdefault(id(connection.to_), connection)
+
     def deserialize(
         self, structure: dict[str, Any], lines: dict[str, Line]
     ) -> Station:
@@ -106,10 +117,7 @@ class Station(Named):
 
     def get_connection(self, other: Station) -> Connection | None:
         """Get connection to the specified station."""
-        connections: list[Connection] = [
-            x for x in self.connections if x.to_ == other
-        ]
-        return connections[0] if connections else None
+        return self._connection_index.get(id(other))
 
     def check_height_and_structure(self) -> None:
         """Check station height and structure consistency."""
@@ -156,33 +164,29 @@ class Station(Named):
         status: dict | None = None,
     ) -> None:
         """Add connection to another station."""
-        connection: Connection
-        for connection in self.connections:
-            if connection.to_ == other_station:
-                if connection.type_ != type_:
-                    logging.warning("change connection type")
-                    connection.type_ = type_
-                return
+        connection: Connection | None = self.get_connection(other_station)
+        if connection:
+            if connection.type_ != type_:
+                logging.warning("change connection type")
+                connection.type_ = type_
+            return
         connection = Connection(other_station, type_, status)
         self.connections.append(connection)
+        self._connection_index[id(other_station)] = connection
 
     def remove_connection(self, other_station: Station) -> int:
-        """Remove connection from this station to another.
+        """Remove all connections from this station to another.
 
         :return: number of connections removed
         """
-        removed: int = 0
-        new_structure: list[Connection] = []
-        connection: Connection
+        if self._connection_index.pop(id(other_station), None) is None:
+            return 0
 
-        for connection in self.connections:
-            if connection.to_ != other_station:
-                new_structure.append(connection)
-            else:
-                removed += 1
-
-        self.connections = new_structure
-        return removed
+        count: int = len(self.connections)
+        self.connections = [
+            x for x in self.connections if x.to_ is not other_station
+        ]
+        return count - len(self.connections)
 
     # Status.
 
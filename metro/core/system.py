@@ -4,14 +4,18 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, TypeVar
 
+from metro.core import json_backend
 from metro.core.line import Line
 from metro.core.named import Named
 from metro.core.station import Connection, Station
 
 if TYPE_CHECKING:
     from collections.abc import Iterator
+    from pathlib import Path
+
+    from metro.core.graph import SystemArrays
 
 __author__ = "Sergey Vartanov"
 __email__ = "me@enzet.ru"
@@ -19,6 +23,8 @@ __email__ = "me@enzet.ru"
 
 DEFAULT_STYLE_ID: str = "normal"
 
+Key = TypeVar("Key")
+
 
 @dataclass
 class System(Named):
@@ -32,12 +38,128 @@ class System(Named):
     line_width: float | None = None
     point_length: float | None = None
 
+    # Lines of the system mapped from their object identities, see `add_line`.
+    line_index: dict[int, Line] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    # Stations of the system indexed by their Wikidata identifiers, by line and
+    # Wikidata identifier, by short identifiers, and by line object
+    # identities, see `add_station`.
+    wikidata_index: dict[int, list[Station]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    line_wikidata_index: dict[tuple[str, int], Station] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    short_id_index: dict[str, list[Station]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    station_line_index: dict[int, list[Station]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    # Stations mapped from captions, for every language requested with
+    # `get_stations_by_name`.  Built on the first request for the language.
+    name_index: dict[str, dict[str, list[Station]]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        for line in self.lines.values():
+            self.line_index[id(line)] = line
+
+        for station in list(self.stations.values()):
+            self.add_station(station)
+
+    def add_line(self, line: Line) -> None:
+        """Add line to the system or replace the line with the same id."""
+
+        if (previous := self.lines.get(line.id_)) is not None:
+            self.line_index.pop(id(previous), None)
+        self.lines[line.id_] = line
+        self.line_index[id(line)] = line
+
+    def has_line(self, line: Line) -> bool:
+        """Check whether this very line object is a line of the system.
+
+        Lines are compared by identity, not by value, so the check does not
+        depend on the number of lines.
+        """
+        return id(line) in self.line_index
+
+    def add_station(self, station: Station) -> None:
+        """Add station to the system or replace the station with the same id.
+
+        Station identifier, Wikidata identifier, line, and names should be set
+        before the station is added: indexes are not updated when the station
+        changes.  To update them, add the station again.
+        """
+        if (previous := self.stations.get(station.id_)) is not None:
+            self.remove_station(previous)
+
+        self.stations[station.id_] = station
+        self.lookup_station_id[station.get_save_id()] = station
+
+        for key in get_short_id_keys(station):
+            self.short_id_index.setdefault(key, []).append(station)
+        if station.wikidata_id is not None:
+            self.wikidata_index.setdefault(station.wikidata_id, []).append(
+                station
+            )
+            if station.line:
+                self.line_wikidata_index.setdefault(
+                    (station.line.id_, station.wikidata_id), station
+                )
+        if station.line:
+            self.station_line_index.setdefault(id(station.line), []).append(
+                station
+            )
+        for language, stations in self.name_index.items():
+            if station.has_name(language):
+                stations.setdefault(station.get_caption(language), []).append(
+                    station
+                )
+
+    def remove_station(self, station: Station) -> None:
+        """Remove station from the system and from all its indexes."""
+
+        if self.stations.get(station.id_) is not station:
+            return
+
+        del self.stations[station.id_]
+        self.lookup_station_id.pop(station.get_save_id(), None)
+
+        for key in get_short_id_keys(station):
+            remove_from_index(self.short_id_index, key, station)
+        if station.wikidata_id is not None:
+            remove_from_index(self.wikidata_index, station.wikidata_id, station)
+            if station.line:
+                key: tuple[str, int] = (station.line.id_, station.wikidata_id)
+                if self.line_wikidata_index.get(key) is station:
+                    del self.line_wikidata_index[key]
+                    for other in self.wikidata_index.get(
+                        station.wikidata_id, []
+                    ):
+                        if other.line and other.line.id_ == station.line.id_:
+                            self.line_wikidata_index[key] = other
+                            break
+        if station.line:
+            remove_from_index(
+                self.station_line_index, id(station.line), station
+            )
+        for language, stations in self.name_index.items():
+            if station.has_name(language):
+                remove_from_index(
+                    stations, station.get_caption(language), station
+                )
+
     def deserialize(self, structure: dict[str, Any]) -> None:
         """Deserialize transport system from structure."""
         if "lines" in structure:
             line: dict[str, Any]
             for line in structure["lines"]:
-                self.lines[line["id"]] = Line({}, line["id"]).deserialize(line)
+                self.add_line(Line({}, line["id"]).deserialize(line))
 
         if "stations" in structure:
             station_structure: dict[str, Any]
@@ -47,7 +169,7 @@ class System(Named):
                 ).deserialize(station_structure, self.lines)
                 if "line" in station_structure:
                     station.line = self.lines[station_structure["line"]]
-                self.stations[station.id_] = station
+                self.add_station(station)
 
             for station_structure in structure["stations"]:
                 if "connections" in station_structure:
@@ -55,10 +177,11 @@ class System(Named):
                     for connection_structure in station_structure[
                         "connections"
                     ]:
-                        station.connections.append(
-                            Connection.deserialize(
-                                connection_structure, self.stations
-                            )
+                        connection: Connection = Connection.deserialize(
+                            connection_structure, self.stations
+                        )
+                        station.add_connection(
+                            connection.to_, connection.type_, connection.status
                         )
 
         for key in structure:
@@ -84,6 +207,29 @@ class System(Named):
             "lines": [x.serialize() for x in self.lines.values()],
         } | ({"line_width": self.line_width} if self.line_width else {})
 
+    def read(self, path: Path) -> None:
+        """Deserialize transport system from JSON file."""
+        self.deserialize(json_backend.loads(path.read_bytes()))
+
+    def write(self, path: Path, *, pretty: bool = True) -> None:
+        """Serialize transport system to JSON file.
+
+        :param path: output file path
+        :param pretty: indent the output, otherwise write it compact
+        """
+        path.write_bytes(json_backend.dumps(self.serialize(), pretty=pretty))
+
+    def to_arrays(self) -> SystemArrays:
+        """Get stations and connections of the system as NumPy arrays.
+
+        Stations are numbered in the order of `stations`.  Connections to
+        stations of other systems are skipped.
+        """
+        # NumPy is imported only when arrays are requested.
+        from metro.core.graph import SystemArrays
+
+        return SystemArrays.from_stations(list(self.stations.values()))
+
     def get_style_id(self) -> str:
         """Get style identifier for the system."""
 
@@ -94,56 +240,43 @@ class System(Named):
     def get_stations_by_short_id(self, station_short_id: str) -> list[Station]:
         """Get stations by short identifier."""
 
-        return [
-            station
-            for station in self.stations.values()
-            if (station.short_id() == station_short_id)
-            or (station.id_ and station.id_.endswith("/" + station_short_id))
-        ]
+        return list(self.short_id_index.get(station_short_id, []))
 
     def get_station_by_wikidata_id(
         self, station_wikidata_id: int
     ) -> Station | None:
         """Get station by Wikidata identifier."""
 
-        station: Station
-        for station in self.stations.values():
-            if station.wikidata_id == station_wikidata_id:
-                return station
-        return None
+        stations: list[Station] = self.wikidata_index.get(
+            station_wikidata_id, []
+        )
+        return stations[0] if stations else None
 
     def get_station_by_line_and_wid(
         self, line_id: str, station_wikidata_id: int
     ) -> Station | None:
         """Get station by line and Wikidata identifier."""
 
-        station: Station
-        for station in self.stations:
-            if (
-                station.wikidata_id == station_wikidata_id
-                and station.line_id == line_id
-            ):
-                return station
-        return None
+        return self.line_wikidata_index.get((line_id, station_wikidata_id))
 
     def get_stations_by_name(self, name: str, language: str) -> list[Station]:
         """Get stations by name in specified language."""
 
-        return [
-            station
-            for station in self.stations.values()
-            if station.has_name(language)
-            and station.get_caption(language) == name
-        ]
+        if language not in self.name_index:
+            stations: dict[str, list[Station]] = {}
+            for station in self.stations.values():
+                if station.has_name(language):
+                    stations.setdefault(
+                        station.get_caption(language), []
+                    ).append(station)
+            self.name_index[language] = stations
+
+        return list(self.name_index[language].get(name, []))
 
     def get_stations_by_line(self, line: Line) -> list[Station]:
-        """Get stations by line object."""
+        """Get stations of this very line object."""
 
-        return [
-            station
-            for station in self.stations.values()
-            if station.line == line
-        ]
+        return list(self.station_line_index.get(id(line), []))
 
     # Line.
 
@@ -176,6 +309,31 @@ class System(Named):
         return bounds
 
 
+def get_short_id_keys(station: Station) -> set[str]:
+    """Get short identifiers the station may be found by.
+
+    These are the second part of the identifier and every part of the
+    identifier after a slash, e.g. `b`, `b/c`, and `c` for `a/b/c`.
+    """
+    parts: list[str] = station.id_.split("/")
+    if len(parts) < 2:  # noqa: PLR2004
+        return set()
+    return {parts[1]} | {"/".join(parts[x:]) for x in range(1, len(parts))}
+
+
+def remove_from_index(
+    index: dict[Key, list[Station]], key: Key, station: Station
+) -> None:
+    """Remove station from the index list, and the list if it gets empty."""
+
+    stations: list[Station] | None = index.get(key)
+    if stations is None:
+        return
+    index[key] = [x for x in stations if x is not station]
+    if not index[key]:
+        del index[key]
+
+
 @dataclass
 class Map:
     """Map representation of transport systems."""
@@ -185,6 +343,10 @@ class Map:
     systems: dict[str, System] = field(default_factory=dict)
     local_languages: list[str] = field(default_factory=list)
 
+    # Languages of names, descriptions, and site links kept in addition to
+    # local languages.  If `None`, all languages are kept.
+    languages: list[str] | None = None
+
     def get_system_by_id(self, system_id: str) -> System:
         """Get system by its string identifier."""
 
@@ -204,6 +366,26 @@ class Map:
 
         return self.local_languages
 
+    def get_languages(self) -> frozenset[str] | None:
+        """Get languages kept for the map: local and allowed languages.
+
+        :return: language identifiers or `None` if all languages are kept
+        """
+        if self.languages is None:
+            return None
+        return frozenset((*self.local_languages, *self.languages))
+
+    def get_line_systems(self) -> dict[int, System]:
+        """Get systems mapped from object identities of their lines.
+
+        If a line object belongs to several systems, the last one is used.
+        """
+        line_systems: dict[int, System] = {}
+        for system in self.systems.values():
+            for line_identity in system.line_index:
+                line_systems[line_identity] = system
+        return line_systems
+
     def get_systems(self) -> Iterator[System]:
         """Get systems of the map."""
 
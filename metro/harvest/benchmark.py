@@ -0,0 +1,116 @@
+"""Measure crawl throughput against the local mock Wikidata server."""
+
+from __future__ import annotations
+
+import logging
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from metro.core import network
+from metro.core.system import Map, System
+from metro.harvest.wikidata import WikidataCityParser, WikidataParser
+
+if TYPE_CHECKING:
+    from metro.harvest.mock_server import MockWikidataServer
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+
+@dataclass
+class BenchmarkResult:
+    """Results of one crawl."""
+
+    # Number of parsed station and line items.
+    items: int
+
+    # Number of requests received by the server, including failed ones.
+    requests: int
+
+    # Crawl time in seconds.
+    wall_time: float
+
+    # Time in seconds the client waited for the rate limiter.
+    throttled_time: float
+
+    def get_items_per_second(self) -> float:
+        """Get number of parsed items per second."""
+        return self.items / self.wall_time if self.wall_time else 0.0
+
+    def report(self) -> None:
+        """Log benchmark results."""
+
+        logging.info(
+            "%d items in %.2f s, %.1f items/s, %d requests, "
+            "throttled for %.1f s",
+            self.items,
+            self.wall_time,
+            self.get_items_per_second(),
+            self.requests,
+            self.throttled_time,
+        )
+
+
+def run_benchmark(
+    server: MockWikidataServer,
+    system_wikidata_id: int,
+    station_wikidata_ids: list[int],
+    concurrency: int | None = None,
+    rate: float = network.DEFAULT_RATE,
+    burst: int = network.DEFAULT_BURST,
+    languages: list[str] | None = None,
+) -> BenchmarkResult:
+    """Crawl transport system served by the running mock server.
+
+    The crawl starts with an empty cache, so every item is requested.
+
+    :param server: running mock server
+    :param system_wikidata_id: Wikidata identifier of the transport system
+    :param station_wikidata_ids: stations to start the crawl from
+    :param concurrency: number of concurrent requests, sequential crawl if not
+        set
+    :param rate: maximum number of requests per second
+    :param burst: maximum number of requests sent at once after a pause
+    :param languages: languages of requested names and site links, full
+        entities are requested if not set
+    """
+    rate_limiter: network.RateLimiter = network.RateLimiter(rate, burst)
+    session: network.Session = network.Session(
+        max_connections_per_host=concurrency
+        or network.DEFAULT_MAX_CONNECTIONS_PER_HOST,
+        rate_limiter=rate_limiter,
+    )
+    requests: int = server.request_count
+
+    with tempfile.TemporaryDirectory() as cache_directory:
+        wikidata_parser: WikidataParser = WikidataParser(
+            Path(cache_directory),
+            session,
+            api_address=server.address,
+            languages=languages,
+        )
+        city_parser: WikidataCityParser = WikidataCityParser(
+            wikidata_parser,
+            Map("metro", {}, {"metro": System({}, "metro")}, ["en"]),
+            {system_wikidata_id: "metro"},
+            station_wikidata_ids,
+            system_wikidata_id,
+            [],
+        )
+        with wikidata_parser.cache:
+            start: float = time.monotonic()
+            city_parser.parse(concurrency=concurrency)
+            wall_time: float = time.monotonic() - start
+
+    session.close()
+
+    return BenchmarkResult(
+        items=len(city_parser.parsed_station_wikidata_ids)
+        + len(city_parser.parsed_line_wikidata_ids),
+        requests=server.request_count - requests,
+        wall_time=wall_time,
+        throttled_time=rate_limiter.throttled_time,
+    )
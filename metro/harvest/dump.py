@@ -0,0 +1,292 @@
+"""Ingest transport data from Wikidata JSON dumps.
+
+See https://www.wikidata.org/wiki/Wikidata:Database_download for the dump
+format: a JSON array with one entity per line.
+"""
+
+from __future__ import annotations
+
+import bz2
+import gzip
+import logging
+import multiprocessing
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from typing import IO, TYPE_CHECKING, Any, Callable
+
+from metro.core import json_backend
+from metro.harvest.wikidata import (
+    WIKIDATA_ITEM_METRO_STATION,
+    WIKIDATA_ITEM_PREFIX,
+    WIKIDATA_PROPERTY_INSTANCE_OF,
+    WIKIDATA_PROPERTY_LINE,
+    WIKIDATA_PROPERTY_NEXT_STATION,
+    WIKIDATA_PROPERTY_PART_OF,
+    WIKIDATA_PROPERTY_TRANSITION_STATION,
+    WIKIDATA_PROPERTY_TRANSPORT_NETWORK,
+    WikidataParser,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from multiprocessing.pool import AsyncResult
+    from pathlib import Path
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+# Entities with these properties are always transport-related.
+TRANSPORT_PROPERTIES: tuple[str, ...] = (
+    WIKIDATA_PROPERTY_LINE,
+    WIKIDATA_PROPERTY_NEXT_STATION,
+    WIKIDATA_PROPERTY_TRANSITION_STATION,
+)
+
+# Properties that link lines and stations to their systems.
+SYSTEM_PROPERTIES: tuple[str, ...] = (
+    WIKIDATA_PROPERTY_PART_OF,
+    WIKIDATA_PROPERTY_TRANSPORT_NETWORK,
+)
+
+# Entity parts that are maps, but are written as empty lists to dumps if they
+# are empty.
+ENTITY_MAP_KEYS: tuple[str, ...] = (
+    "labels",
+    "descriptions",
+    "aliases",
+    "claims",
+    "sitelinks",
+)
+
+# Log progress every this number of dump lines.
+PROGRESS_STEP: int = 1_000_000
+
+# Number of dump lines processed by worker process at once.
+CHUNK_SIZE: int = 10_000
+
+
+def open_dump(path: Path) -> IO[bytes]:
+    """Open dump file, compressed with bzip2 or gzip, or uncompressed."""
+
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return path.open("rb")
+
+
+def get_claim_ids(entity: dict[str, Any], property_: str) -> list[str]:
+    """Get identifiers of items that are values of entity claims."""
+
+    return [
+        claim["mainsnak"]["datavalue"]["value"]["id"]
+        for claim in entity.get("claims", {}).get(property_, [])
+        if "datavalue" in claim["mainsnak"]
+    ]
+
+
+@dataclass(frozen=True)
+class DumpFilter:
+    """Filter of transport-related entities in the dump.
+
+    Entity is relevant if it is a root (a transport system) or it is a part of
+    a root, it has line, next station, or transition station claims, or it is
+    an instance of metro station.
+
+    If `wanted` is specified, only entities with these identifiers are
+    relevant.
+    """
+
+    roots: frozenset[int] = frozenset()
+    wanted: frozenset[int] | None = None
+
+    def get_markers(self) -> list[bytes]:
+        """Get byte strings one of which every relevant dump line contains.
+
+        Checking markers is much faster than JSON decoding, so most of the dump
+        lines are skipped without decoding.
+        """
+        if self.wanted is not None:
+            return [
+                f'"{WIKIDATA_ITEM_PREFIX}{x}"'.encode() for x in self.wanted
+            ]
+
+        return [
+            *(f'"{x}"'.encode() for x in TRANSPORT_PROPERTIES),
+            *(f'"{WIKIDATA_ITEM_PREFIX}{x}"'.encode() for x in self.roots),
+            f'"{WIKIDATA_ITEM_METRO_STATION}"'.encode(),
+        ]
+
+    def filter(self, line: bytes) -> dict[str, Any] | None:
+        """Decode dump line and check if the entity is relevant.
+
+        Empty entity parts written as lists are replaced with empty maps.
+
+        :param line: dump line with one entity
+        :return: entity or `None` if it is not relevant
+        """
+        line = line.strip().rstrip(b",")
+        if not line.startswith(b"{"):
+            return None
+
+        entity: dict[str, Any] = json_backend.loads(line)
+        for key in ENTITY_MAP_KEYS:
+            if entity.get(key) == []:
+                entity[key] = {}
+        entity_id: str = entity.get("id", "")
+        if not entity_id.startswith(WIKIDATA_ITEM_PREFIX):
+            return None
+        wikidata_id: int = int(entity_id[len(WIKIDATA_ITEM_PREFIX) :])
+
+        if self.wanted is not None:
+            return entity if wikidata_id in self.wanted else None
+
+        claims: dict[str, Any] = entity.get("claims", {})
+
+        if (
+            wikidata_id in self.roots
+            or any(x in claims for x in TRANSPORT_PROPERTIES)
+            or WIKIDATA_ITEM_METRO_STATION
+            in get_claim_ids(entity, WIKIDATA_PROPERTY_INSTANCE_OF)
+        ):
+            return entity
+
+        for property_ in SYSTEM_PROPERTIES:
+            for system_id in get_claim_ids(entity, property_):
+                if int(system_id[len(WIKIDATA_ITEM_PREFIX) :]) in self.roots:
+                    return entity
+
+        return None
+
+
+def filter_chunk(
+    dump_filter: DumpFilter, lines: list[bytes]
+) -> list[dict[str, Any]]:
+    """Get relevant entities from dump lines.
+
+    This function is executed by worker processes.
+    """
+    markers: list[bytes] = dump_filter.get_markers()
+    entities: list[dict[str, Any]] = []
+
+    line: bytes
+    for line in lines:
+        if not any(marker in line for marker in markers):
+            continue
+        if (entity := dump_filter.filter(line)) is not None:
+            entities.append(entity)
+
+    return entities
+
+
+def read_chunks(lines: Iterable[bytes]) -> Iterator[list[bytes]]:
+    """Split dump lines into chunks of `CHUNK_SIZE` lines."""
+
+    chunk: list[bytes] = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def filter_dump(
+    lines: Iterable[bytes], dump_filter: DumpFilter, workers: int = 1
+) -> Iterator[dict[str, Any]]:
+    """Get relevant entities from dump lines.
+
+    :param lines: dump lines
+    :param dump_filter: filter of relevant entities
+    :param workers: number of worker processes that decode and filter lines;
+        entities are returned in the dump order for any number of workers
+    :raises ValueError: if the number of workers is less than one
+    """
+    if workers < 1:
+        message: str = f"number of workers should be positive, not {workers}"
+        raise ValueError(message)
+
+    chunks: Iterator[list[bytes]] = read_chunks(lines)
+    filter_: Callable[[list[bytes]], list[dict[str, Any]]] = partial(
+        filter_chunk, dump_filter
+    )
+
+    if workers == 1:
+        for index, chunk in enumerate(chunks):
+            log_progress(index)
+            yield from filter_(chunk)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        # Keep only a few chunks in flight, so that memory usage does not
+        # depend on the dump size.
+        pending: deque[AsyncResult] = deque()
+        index: int = 0
+        for chunk in chunks:
+            pending.append(pool.apply_async(filter_, (chunk,)))
+            if len(pending) >= workers * 2:
+                log_progress(index)
+                index += 1
+                yield from pending.popleft().get()
+        while pending:
+            log_progress(index)
+            index += 1
+            yield from pending.popleft().get()
+
+
+def log_progress(chunk_index: int) -> None:
+    """Log number of processed lines."""
+
+    if chunk_index and chunk_index * CHUNK_SIZE % PROGRESS_STEP == 0:
+        logging.info("%d lines processed", chunk_index * CHUNK_SIZE)
+
+
+def ingest_dump(
+    path: Path,
+    wikidata_parser: WikidataParser,
+    roots: Iterable[int] = (),
+    workers: int = 1,
+) -> int:
+    """Put transport-related entities from the dump into the parser cache.
+
+    The dump is read line by line, so memory usage does not depend on the dump
+    size.  Lines referenced by stations, but not related to roots, are read
+    with the second pass over the dump.
+
+    Lines are decoded and filtered by worker processes, while this process
+    decompresses the dump and writes entities to the cache in the dump order,
+    so the cache contents do not depend on the number of workers.
+
+    :param path: path to the dump file
+    :param wikidata_parser: parser with the cache to fill
+    :param roots: Wikidata identifiers of transport systems
+    :param workers: number of worker processes
+    :return: number of stored entities
+    """
+    stored: set[int] = set()
+    referenced: set[int] = set()
+
+    dump_filter: DumpFilter = DumpFilter(frozenset(roots))
+    with open_dump(path) as input_file:
+        for entity in filter_dump(input_file, dump_filter, workers):
+            wikidata_id: int = int(entity["id"][len(WIKIDATA_ITEM_PREFIX) :])
+            wikidata_parser.store(wikidata_id, entity)
+            stored.add(wikidata_id)
+            referenced.update(
+                int(x[len(WIKIDATA_ITEM_PREFIX) :])
+                for x in get_claim_ids(entity, WIKIDATA_PROPERTY_LINE)
+            )
+
+    if missing := referenced - stored:
+        logging.info("reading %d referenced lines", len(missing))
+        dump_filter = DumpFilter(wanted=frozenset(missing))
+        with open_dump(path) as input_file:
+            for entity in filter_dump(input_file, dump_filter, workers):
+                wikidata_id = int(entity["id"][len(WIKIDATA_ITEM_PREFIX) :])
+                wikidata_parser.store(wikidata_id, entity)
+                stored.add(wikidata_id)
+
+    logging.info("%d entities stored", len(stored))
+    return len(stored)
@@ -0,0 +1,372 @@
+"""Local stand-in for the Wikidata API.
+
+The server answers `wbgetentities` requests with entities from a fixture
+directory or from a generated transport network, so that the crawl may be
+tested and measured without requests to Wikidata.  It may slow down responses
+and inject failures and throttling to check how the crawler handles them.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qs, urlparse
+
+from metro.core import json_backend
+from metro.harvest.wikidata import (
+    WIKIDATA_ITEM_PREFIX,
+    WIKIDATA_PROPERTY_COORDINATES,
+    WIKIDATA_PROPERTY_LINE,
+    WIKIDATA_PROPERTY_NEXT_STATION,
+    WIKIDATA_PROPERTY_PART_OF,
+    WIKIDATA_PROPERTY_TRANSITION_STATION,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+# Path of the API on the mock server, the same as on Wikidata.
+API_PATH: str = "/w/api.php"
+
+# Wikidata identifier of the generated transport system.  Lines and stations
+# get identifiers from `FIRST_LINE_ID` and `FIRST_STATION_ID`.
+SYSTEM_ID: int = 1
+FIRST_LINE_ID: int = 1_000
+FIRST_STATION_ID: int = 100_000
+
+# Revision identifier of all generated entities.
+REVISION: int = 1
+
+# Distance between neighbour generated stations in degrees.
+STATION_STEP: float = 0.01
+
+# Wikipedia sites of generated site links.
+GENERATED_SITES: tuple[str, ...] = ("enwiki", "dewiki")
+
+# Entity parts that are returned for any requested `props`.
+ENTITY_KEYS: tuple[str, ...] = ("id", "type")
+
+
+def get_item_id(wikidata_id: int) -> str:
+    """Get Wikidata item identifier, e.g. `Q123`."""
+    return f"{WIKIDATA_ITEM_PREFIX}{wikidata_id}"
+
+
+def claim(property_: str, value: dict[str, Any]) -> dict[str, Any]:
+    """Create Wikidata claim."""
+
+    return {
+        "mainsnak": {"property": property_, "datavalue": {"value": value}},
+        "rank": "normal",
+    }
+
+
+def item_claim(property_: str, wikidata_id: int) -> dict[str, Any]:
+    """Create Wikidata claim with item value."""
+
+    return claim(
+        property_, {"id": get_item_id(wikidata_id), "numeric-id": wikidata_id}
+    )
+
+
+def generate_network(
+    line_count: int, stations_per_line: int
+) -> dict[str, dict[str, Any]]:
+    """Generate entities of a transport system.
+
+    Lines are parallel, neighbour stations of every line are connected, and
+    the middle stations of neighbour lines are transition stations.
+
+    :param line_count: number of lines
+    :param stations_per_line: number of stations of every line
+    :return: entities mapped from their identifiers
+    """
+
+    def get_station_id(line_index: int, station_index: int) -> int:
+        return FIRST_STATION_ID + line_index * stations_per_line + station_index
+
+    def entity(wikidata_id: int, name: str, claims: dict) -> dict[str, Any]:
+        return {
+            "type": "item",
+            "id": get_item_id(wikidata_id),
+            "lastrevid": REVISION,
+            "labels": {"en": {"language": "en", "value": name}},
+            "descriptions": {},
+            "aliases": {},
+            "claims": claims,
+            "sitelinks": {
+                x: {"site": x, "title": name} for x in GENERATED_SITES
+            },
+        }
+
+    entities: list[dict[str, Any]] = [entity(SYSTEM_ID, "Metro", {})]
+    middle: int = stations_per_line // 2
+
+    for line_index in range(line_count):
+        line_id: int = FIRST_LINE_ID + line_index
+        entities.append(
+            entity(
+                line_id,
+                f"Line {line_index + 1}",
+                {
+                    WIKIDATA_PROPERTY_PART_OF: [
+                        item_claim(WIKIDATA_PROPERTY_PART_OF, SYSTEM_ID)
+                    ]
+                },
+            )
+        )
+        for station_index in range(stations_per_line):
+            claims: dict[str, list[dict[str, Any]]] = {
+                WIKIDATA_PROPERTY_LINE: [
+                    item_claim(WIKIDATA_PROPERTY_LINE, line_id)
+                ],
+                WIKIDATA_PROPERTY_NEXT_STATION: [
+                    item_claim(
+                        WIKIDATA_PROPERTY_NEXT_STATION,
+                        get_station_id(line_index, x),
+                    )
+                    for x in (station_index - 1, station_index + 1)
+                    if 0 <= x < stations_per_line
+                ],
+                WIKIDATA_PROPERTY_COORDINATES: [
+                    claim(
+                        WIKIDATA_PROPERTY_COORDINATES,
+                        {
+                            "latitude": line_index * STATION_STEP,
+                            "longitude": station_index * STATION_STEP,
+                        },
+                    )
+                ],
+            }
+            if station_index == middle:
+                claims[WIKIDATA_PROPERTY_TRANSITION_STATION] = [
+                    item_claim(
+                        WIKIDATA_PROPERTY_TRANSITION_STATION,
+                        get_station_id(x, middle),
+                    )
+                    for x in (line_index - 1, line_index + 1)
+                    if 0 <= x < line_count
+                ]
+            entities.append(
+                entity(
+                    get_station_id(line_index, station_index),
+                    f"Station {line_index + 1}.{station_index + 1}",
+                    claims,
+                )
+            )
+
+    return {x["id"]: x for x in entities}
+
+
+def load_fixtures(directory: Path) -> dict[str, dict[str, Any]]:
+    """Load entities from JSON files of the directory.
+
+    Every file contains either one entity or a `wbgetentities` response, e.g.
+    a decompressed cache entry.
+
+    :return: entities mapped from their identifiers
+    """
+    entities: dict[str, dict[str, Any]] = {}
+
+    path: Path
+    for path in sorted(directory.glob("*.json")):
+        structure: dict[str, Any] = json_backend.loads(path.read_bytes())
+        if "entities" in structure:
+            entities |= structure["entities"]
+        else:
+            entities[structure["id"]] = structure
+
+    return entities
+
+
+class MockWikidataServer(ThreadingHTTPServer):
+    """HTTP server that answers `wbgetentities` requests.
+
+    Statistics are thread-safe, because every request is handled in its own
+    thread.
+    """
+
+    daemon_threads: bool = True
+
+    def __init__(
+        self,
+        entities: dict[str, dict[str, Any]],
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize server.
+
+        :param entities: entities mapped from their identifiers
+        :param port: port to listen on, any free port if `0`
+        :param latency: time in seconds to wait before every response
+        :param error_rate: probability of `500 Internal Server Error` response
+        :param throttle_rate: probability of `429 Too Many Requests` response
+        :param retry_after: number of seconds in `Retry-After` header of `429`
+            responses
+        :param seed: seed of failure injection for reproducible runs
+        """
+        super().__init__(("127.0.0.1", port), MockWikidataHandler)
+        self.entities: dict[str, dict[str, Any]] = entities
+        self.latency: float = latency
+        self.error_rate: float = error_rate
+        self.throttle_rate: float = throttle_rate
+        self.retry_after: int = retry_after
+        self.random: random.Random = random.Random(seed)  # noqa: S311
+
+        self.request_count: int = 0
+        self.error_count: int = 0
+        self.throttled_count: int = 0
+        self.entity_count: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+        self.thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> str:
+        """Get address of the API."""
+        return f"http://127.0.0.1:{self.server_address[1]}{API_PATH}"
+
+    def start(self) -> None:
+        """Serve requests in a background thread."""
+
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop serving requests and close the socket."""
+
+        self.shutdown()
+        self.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def choose_status(self) -> HTTPStatus:
+        """Choose response status according to failure probabilities."""
+
+        with self.lock:
+            self.request_count += 1
+            value: float = self.random.random()
+            if value < self.throttle_rate:
+                self.throttled_count += 1
+                return HTTPStatus.TOO_MANY_REQUESTS
+            if value < self.throttle_rate + self.error_rate:
+                self.error_count += 1
+                return HTTPStatus.INTERNAL_SERVER_ERROR
+            return HTTPStatus.OK
+
+    def get_entities(self, parameters: dict[str, str]) -> dict[str, Any]:
+        """Get `wbgetentities` response.
+
+        Only `ids`, `props`, `languages`, and `sitefilter` parameters are
+        supported.
+        """
+        props: set[str] | None = (
+            set(parameters["props"].split("|"))
+            if "props" in parameters
+            else None
+        )
+        languages: set[str] | None = (
+            set(parameters["languages"].split("|"))
+            if "languages" in parameters
+            else None
+        )
+        sites: set[str] | None = (
+            set(parameters["sitefilter"].split("|"))
+            if "sitefilter" in parameters
+            else None
+        )
+        entities: dict[str, Any] = {}
+
+        entity_id: str
+        for entity_id in parameters.get("ids", "").split("|"):
+            entity: dict[str, Any] | None = self.entities.get(entity_id)
+            if entity is None:
+                entities[entity_id] = {"id": entity_id, "missing": ""}
+                continue
+            if props is not None:
+                entity = {
+                    x: y
+                    for x, y in entity.items()
+                    if x in ENTITY_KEYS
+                    or x in props
+                    or (x == "lastrevid" and "info" in props)
+                }
+            if languages is not None:
+                entity = entity | {
+                    x: {z: w for z, w in entity[x].items() if z in languages}
+                    for x in ("labels", "descriptions", "aliases")
+                    if x in entity
+                }
+            if sites is not None and "sitelinks" in entity:
+                entity = entity | {
+                    "sitelinks": {
+                        x: y
+                        for x, y in entity["sitelinks"].items()
+                        if x in sites
+                    }
+                }
+            entities[entity_id] = entity
+
+        with self.lock:
+            self.entity_count += len(entities)
+        return {"entities": entities, "success": 1}
+
+
+class MockWikidataHandler(BaseHTTPRequestHandler):
+    """Handler of requests to the mock Wikidata API."""
+
+    server: MockWikidataServer
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer `GET` request."""
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        url = urlparse(self.path)
+        if url.path != API_PATH:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        status: HTTPStatus = self.server.choose_status()
+        if status == HTTPStatus.TOO_MANY_REQUESTS:
+            self.send_response(status)
+            self.send_header("Retry-After", str(self.server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if status != HTTPStatus.OK:
+            self.send_error(status)
+            return
+
+        parameters: dict[str, str] = {
+            x: y[-1] for x, y in parse_qs(url.query).items()
+        }
+        if parameters.get("action") != "wbgetentities":
+            self.send_error(HTTPStatus.BAD_REQUEST)
+            return
+
+        content: bytes = json_backend.dumps(
+            self.server.get_entities(parameters)
+        )
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        """Log requests at debug level only."""
+        logging.debug(format, *args)
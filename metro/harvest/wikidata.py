@@ -2,19 +2,30 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
+import hashlib
 import logging
 import re
-from dataclasses import dataclass
-from datetime import datetime
-from time import timezone
-from typing import TYPE_CHECKING, Any, ClassVar, Union
-
-from metro.core import data, network
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Union
+
+from metro.core import data, json_backend, network
+from metro.core.cache import (
+    Cache,
+    CacheStats,
+    create_cache,
+    write_atomically,
+)
 from metro.core.line import Line
 from metro.core.station import ConnectionType, ObjectStatus, Station
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from collections.abc import Set as AbstractSet
     from pathlib import Path
 
     from metro.core.system import Map, System
@@ -25,8 +36,54 @@ __email__ = "me@enzet.ru"
 
 JSONSerializable = Union[str, int, float, list, dict, None]
 
+# Function that extracts item fields from all claims of one property.
+ClaimHandler = Callable[[Any, list[dict[str, Any]]], None]
+
 WIKIDATA_ITEM_PREFIX = "Q"
 
+WIKIDATA_API_ADDRESS: str = "https://www.wikidata.org/w/api.php"
+
+# Ask the API to refuse requests if database replication lag is higher than
+# this number of seconds, see https://www.mediawiki.org/wiki/Manual:Maxlag.
+WIKIDATA_MAXLAG: int = 5
+
+# Entity parts requested if the parser is limited to some languages.  `info`
+# contains the last revision identifier.
+WIKIDATA_PROJECTION_PROPS: tuple[str, ...] = (
+    "info",
+    "labels",
+    "descriptions",
+    "claims",
+    "sitelinks",
+)
+
+# Languages of names and descriptions read while items are parsed, kept even
+# if the map is limited to other languages: identifiers of lines and stations
+# are computed from English names first, and station status is detected from
+# descriptions in the languages of `WikidataStationItem.type_map`.  Names are
+# written in the map languages only.
+PARSING_LANGUAGES: frozenset[str] = frozenset(("en", "ru"))
+
+# Site links to Wikipedia have `<language>wiki` keys.
+WIKIPEDIA_SITE_SUFFIX: str = "wiki"
+
+# Maximum number of items in one `wbgetentities` request.
+WIKIDATA_BATCH_SIZE: int = 50
+
+# Default maximum number of decoded item structures kept in memory.  Full
+# entities may take hundreds of kilobytes each, and items are parsed again
+# mostly for lines and systems shared by stations, so a few hundred are enough.
+DEFAULT_MEMORY_SIZE: int = 256
+
+# Default number of concurrent requests for asynchronous crawling.
+DEFAULT_CONCURRENCY: int = 4
+
+# Save crawl checkpoint after every this number of processed batches.
+CHECKPOINT_STEP: int = 10
+
+# Version of the checkpoint file format.
+CHECKPOINT_VERSION: int = 1
+
 WIKIDATA_PROPERTY_ROUTE_MAP = "P15"
 WIKIDATA_PROPERTY_TRANSPORT_NETWORK = "P16"
 WIKIDATA_PROPERTY_COUNTRY = "P17"
@@ -73,54 +130,193 @@ WIKIDATA_ITEM_RAPID_TRANSIT_LINE = "Q15079663"
 WIKIDATA_ITEM_STATION_LOCATED_UNDERGROUND = "Q22808403"
 WIKIDATA_ITEM_STATION_LOCATED_ON_SURFACE = "Q22808404"
 
+# Properties kept in claims and claim qualifiers of slim cache entries: all
+# properties claim handlers and qualifier checks read.  Properties of handlers
+# added with `WikidataItem.add_claim_handler` should be added here as well.
+SLIM_PROPERTIES: tuple[str, ...] = (
+    WIKIDATA_PROPERTY_TRANSPORT_NETWORK,
+    WIKIDATA_PROPERTY_INSTANCE_OF,
+    WIKIDATA_PROPERTY_LINE,
+    WIKIDATA_PROPERTY_NEXT_STATION,
+    WIKIDATA_PROPERTY_PART_OF,
+    WIKIDATA_PROPERTY_COMPLEX_COLOR,
+    WIKIDATA_PROPERTY_COLOR,
+    WIKIDATA_PROPERTY_END_DATE,
+    WIKIDATA_PROPERTY_COORDINATES,
+    WIKIDATA_PROPERTY_TRANSITION_STATION,
+    WIKIDATA_PROPERTY_DATE_OF_OFFICIAL_OPENING,
+    WIKIDATA_PROPERTY_VERTICAL_DEPTH,
+)
+
+# Claim parts kept in slim cache entries.  References are never used.
+SLIM_CLAIM_KEYS: tuple[str, ...] = ("mainsnak", "qualifiers", "rank")
+
+# Version of the slim entry format.  Increase it if entities are pruned
+# differently, so that existing slim entries are requested again.  Adding a new
+# property changes `SLIM_PROPERTIES` and has the same effect.
+SLIM_VERSION: int = 1
+
 
 class WikidataItem:
-    """Item of Wikidata project."""
+    """Item of Wikidata project.
+
+    Names, descriptions, aliases, and site links are extracted from the entity
+    on first access.  Subclasses extract claims in `__init__`, after that the
+    entity may be dropped with `release`.  Only names, site links, and fields
+    extracted before are available after that.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "_aliases",
+        "_descriptions",
+        "_names",
+        "_site_links",
+        "entity",
+        "languages",
+        "wikidata_id",
+    )
 
-    def __init__(self, structure: dict, wikidata_id: int) -> None:
+    def __init__(
+        self,
+        structure: dict,
+        wikidata_id: int,
+        languages: AbstractSet[str] | None = None,
+    ) -> None:
         """Initialize Wikidata item.
 
         :param structure: Wikidata item structure
         :param wikidata_id: Wikidata item unique identifier
+        :param languages: if specified, Wikipedia site links in other
+            languages are ignored, and names are written in these languages
+            only; names, descriptions, and aliases in `PARSING_LANGUAGES` are
+            kept for parsing
+        :raises ValueError: if the structure has no entity of the item
         """
         self.wikidata_id: int = wikidata_id
+        self.languages: AbstractSet[str] | None = languages
 
-        if "entities" not in structure:
-            logging.warning("no entities in Wikidata entity")
-            self.entity = None
-        if WIKIDATA_ITEM_PREFIX + str(wikidata_id) not in structure["entities"]:
-            logging.error("bad Wikidata structure: no entity")
-            self.entity = None
-        self.entity = structure["entities"][
+        entity: dict[str, Any] | None = structure.get("entities", {}).get(
             WIKIDATA_ITEM_PREFIX + str(wikidata_id)
-        ]
-
-        self.claims: dict[str, list[dict[str, Any]]] = self.entity.get(
-            "claims", {}
         )
-        self.names: dict[str, str] = {}
-        if "labels" in self.entity:
-            for language in self.entity["labels"]:
-                self.names[language] = self.entity["labels"][language]["value"]
-
-        self.descriptions: dict[str, str] = {}
-        if "descriptions" in self.entity:
-            for language in self.entity["descriptions"]:
-                self.descriptions[language] = self.entity["descriptions"][
-                    language
-                ]["value"]
-
-        self.aliases: dict[str, list[str]] = {}
-        if "aliases" in self.entity:
-            for language in self.entity["aliases"]:
-                self.aliases[language] = []
-                for alias in self.entity["aliases"][language]:
-                    self.aliases[language].append(alias["value"])
-
-        self.site_links: dict[str, str] = {}
-        if "sitelinks" in self.entity:
-            for site in self.entity["sitelinks"]:
-                self.site_links[site] = self.entity["sitelinks"][site]["title"]
+        if entity is None:
+            message: str = f"bad Wikidata structure: no entity Q{wikidata_id}"
+            raise ValueError(message)
+        self.entity: dict[str, Any] | None = entity
+
+        self._names: dict[str, str] | None = None
+        self._descriptions: dict[str, str] | None = None
+        self._aliases: dict[str, list[str]] | None = None
+        self._site_links: dict[str, str] | None = None
+
+    # Claim handlers mapped from property identifiers.  Every handler gets all
+    # claims of its property.  Handlers are called in this order, so that a
+    # handler may use fields set by previous ones.
+    claim_handlers: ClassVar[dict[str, ClaimHandler]] = {}
+
+    @classmethod
+    def add_claim_handler(cls, property_: str, handler: ClaimHandler) -> None:
+        """Register handler for claims of the property, called after others."""
+        cls.claim_handlers = cls.claim_handlers | {property_: handler}
+
+    def extract_claims(self) -> None:
+        """Call claim handlers for every property the entity has claims of."""
+
+        claims: dict[str, list[dict[str, Any]]] = self.claims
+
+        property_: str
+        handler: ClaimHandler
+        for property_, handler in self.claim_handlers.items():
+            if values := claims.get(property_):
+                handler(self, values)
+
+    def release(self) -> None:
+        """Extract names and site links and drop the entity to free memory."""
+
+        _ = self.names, self.site_links
+        self.entity = None
+
+    def _get_part(self, key: str) -> dict[str, Any]:
+        """Get entity part, e.g. `labels`, in the item languages.
+
+        :param key: `labels`, `descriptions`, `aliases`, or `sitelinks`
+        :return: part values mapped from languages or sites, empty if the part
+            is missing
+        :raises ValueError: if the item is released
+        """
+        if self.entity is None:
+            message: str = f"{key} of released item Q{self.wikidata_id}"
+            raise ValueError(message)
+        part: dict[str, Any] = self.entity.get(key, {})
+        if self.languages is None:
+            return part
+        if key == "sitelinks":
+            return {
+                x: y
+                for x, y in part.items()
+                if get_site_language(x) in self.languages
+            }
+        return {
+            x: y
+            for x, y in part.items()
+            if x in self.languages or x in PARSING_LANGUAGES
+        }
+
+    @property
+    def claims(self) -> dict[str, list[dict[str, Any]]]:
+        """Get entity claims, only available before `release`."""
+
+        if self.entity is None:
+            message: str = f"claims of released item Q{self.wikidata_id}"
+            raise ValueError(message)
+        return self.entity.get("claims", {})
+
+    @property
+    def names(self) -> dict[str, str]:
+        """Get item names mapped from languages."""
+
+        if self._names is None:
+            self._names = {
+                x: y["value"] for x, y in self._get_part("labels").items()
+            }
+        return self._names
+
+    @property
+    def descriptions(self) -> dict[str, str]:
+        """Get item descriptions mapped from languages."""
+
+        if self._descriptions is None:
+            self._descriptions = {
+                x: y["value"] for x, y in self._get_part("descriptions").items()
+            }
+        return self._descriptions
+
+    @property
+    def aliases(self) -> dict[str, list[str]]:
+        """Get item aliases mapped from languages."""
+
+        if self._aliases is None:
+            self._aliases = {
+                x: [z["value"] for z in y]
+                for x, y in self._get_part("aliases").items()
+            }
+        return self._aliases
+
+    @property
+    def site_links(self) -> dict[str, str]:
+        """Get titles of item pages mapped from site identifiers."""
+
+        if self._site_links is None:
+            self._site_links = {
+                x: y["title"] for x, y in self._get_part("sitelinks").items()
+            }
+        return self._site_links
+
+    def get_output_names(self) -> dict[str, str]:
+        """Get item names in the item languages, written to the output."""
+
+        if self.languages is None:
+            return self.names
+        return {x: y for x, y in self.names.items() if x in self.languages}
 
     def get_name(self, language: str = "en") -> str | None:
         """Get item name in specified language if it exists.
@@ -128,30 +324,19 @@ class WikidataItem:
         :param language: requested language of the name
         :return: item name or `None`
         """
-        if "labels" not in self.entity or language not in self.entity["labels"]:
-            return None
-        return self.entity["labels"][language]["value"]
+        return self.names.get(language)
 
     def has_name(self, language: str = "en") -> bool:
         """Check if item has name in specified language."""
-
-        if "labels" not in self.entity:
-            return False
-        if language not in self.entity["labels"]:
-            return False
-        return (
-            language in self.entity["labels"]
-            and "value" in self.entity["labels"][language]
-            and self.entity["labels"][language]["value"]
-        )
+        return bool(self.names.get(language))
 
     def get_any_name(self) -> str:
         """Get any item name if it exists."""
-        if "labels" not in self.entity:
+        if not self.names:
             return "unknown"
-        if "en" in self.entity["labels"]:
-            return self.entity["labels"]["en"]["value"]
-        return next(iter(self.entity["labels"].values()))["value"]
+        if "en" in self.names:
+            return self.names["en"]
+        return next(iter(self.names.values()))
 
 
 class WikidataTime:
@@ -168,6 +353,9 @@ class WikidataTime:
             time = time[:9] + "01" + time[11:]
         if time.startswith("+"):
             time = time[1:]
+        # Python before 3.11 does not parse `Z` as UTC.
+        if time.endswith("Z"):
+            time = time[:-1] + "+00:00"
         self.time: datetime = datetime.fromisoformat(time)
 
         self.timezone: str = time_point["timezone"]
@@ -176,12 +364,64 @@ class WikidataTime:
         self.after: bool = time_point["after"]
 
 
+def get_revision(structure: dict) -> int | None:
+    """Get identifier of the last revision of Wikidata item structure."""
+
+    entity: dict
+    for entity in structure.get("entities", {}).values():
+        return entity.get("lastrevid")
+    return None
+
+
+def get_requested_wikidata_id(key: str, entity: dict[str, Any]) -> int:
+    """Get requested item identifier of the `wbgetentities` response entity.
+
+    If the item is redirected, the entity is returned under the identifier of
+    the redirect target.
+
+    :param key: entity key in the response
+    :param entity: Wikidata entity
+    """
+    requested_key: str = entity.get("redirects", {}).get("from", key)
+    return int(requested_key[len(WIKIDATA_ITEM_PREFIX) :])
+
+
 def get_value(claim: dict) -> JSONSerializable:
     """Get value from Wikidata claim."""
 
     return claim["mainsnak"]["datavalue"]["value"]
 
 
+def get_site_language(site: str) -> str | None:
+    """Get language of Wikipedia site, e.g. `be-x-old` for `be_x_oldwiki`.
+
+    :return: language or `None` if the site is not a Wikipedia
+    """
+    if not site.endswith(WIKIPEDIA_SITE_SUFFIX):
+        return None
+    return site[: -len(WIKIPEDIA_SITE_SUFFIX)].replace("_", "-")
+
+
+def get_site(language: str) -> str:
+    """Get Wikipedia site of language, e.g. `be_x_oldwiki` for `be-x-old`."""
+
+    return language.replace("-", "_") + WIKIPEDIA_SITE_SUFFIX
+
+
+def get_value_or_none(claim: dict) -> JSONSerializable:
+    """Get value from Wikidata claim or `None` if the claim has no value."""
+
+    datavalue: dict | None = claim["mainsnak"].get("datavalue")
+    return None if datavalue is None else datavalue["value"]
+
+
+def get_item_number(claim: dict) -> int | None:
+    """Get numeric Wikidata identifier of the claim item value."""
+
+    value: dict | None = get_value_or_none(claim)
+    return None if value is None else value["numeric-id"]
+
+
 class WikidataStationItem(WikidataItem):
     """Wikidata item that describes transport station.
 
@@ -205,45 +445,39 @@ class WikidataStationItem(WikidataItem):
         },
     }
 
-    def __init__(self, structure: dict, wikidata_id: int) -> None:
-        super().__init__(structure, wikidata_id)
+    __slots__: tuple[str, ...] = (
+        "altitude",
+        "geo_position",
+        "height",
+        "line_wikidata_ids",
+        "next_connections",
+        "open_time",
+        "stations",
+        "status",
+        "structure_type",
+        "system_wikidata_ids",
+        "transition_connections",
+    )
 
-        name: str = WIKIDATA_ITEM_PREFIX + str(wikidata_id)
+    def __init__(
+        self,
+        structure: dict,
+        wikidata_id: int,
+        languages: AbstractSet[str] | None = None,
+    ) -> None:
+        super().__init__(structure, wikidata_id, languages)
 
         self.structure_type: str | None = None
-
-        if WIKIDATA_PROPERTY_INSTANCE_OF in self.claims:
-            for claim in self.claims[WIKIDATA_PROPERTY_INSTANCE_OF]:
-                if get_value(claim)["id"] == WIKIDATA_ITEM_METRO_STATION:
-                    _ = "metro"
-                if (
-                    get_value(claim)["id"]
-                    == WIKIDATA_ITEM_STATION_LOCATED_ON_SURFACE
-                ):
-                    self.structure_type = "ground"
-                if (
-                    get_value(claim)["id"]
-                    == WIKIDATA_ITEM_STATION_LOCATED_UNDERGROUND
-                ):
-                    self.structure_type = "underground"
-
         self.system_wikidata_ids: set[int] = set()
-
-        if WIKIDATA_PROPERTY_PART_OF in self.claims:
-            self.system_wikidata_ids.add(
-                get_value(self.claims[WIKIDATA_PROPERTY_PART_OF][0])[
-                    "numeric-id"
-                ]
-            )
-
-        if WIKIDATA_PROPERTY_TRANSPORT_NETWORK in self.claims:
-            self.system_wikidata_ids.add(
-                get_value(self.claims[WIKIDATA_PROPERTY_TRANSPORT_NETWORK][0])[
-                    "numeric-id"
-                ]
-            )
-
         self.status: dict[str, ObjectStatus] = {}
+        self.open_time: datetime | None = None
+        self.geo_position: tuple[float, float] | None = None
+        self.altitude: float | None = None
+        self.line_wikidata_ids: list[int] = []
+        self.next_connections: list[tuple[int, int]] = []
+        self.transition_connections: list[int] = []
+        self.height: float | None = None
+        self.stations: list[Station] = []
 
         for language in self.type_map:
             if language in self.descriptions:
@@ -252,128 +486,128 @@ class WikidataStationItem(WikidataItem):
                         self.status = {"type": self.type_map[language][pattern]}
                         break
 
-        self.open_time: datetime | None = None
+        self.extract_claims()
 
-        if WIKIDATA_PROPERTY_DATE_OF_OFFICIAL_OPENING in self.claims:
-            if (
-                "datavalue"
-                not in self.claims[WIKIDATA_PROPERTY_DATE_OF_OFFICIAL_OPENING][
-                    0
-                ]["mainsnak"]
-            ):
+    def _extract_structure_type(self, claims: list[dict[str, Any]]) -> None:
+        for claim in claims:
+            value: dict | None = get_value_or_none(claim)
+            if value is None:
+                continue
+            if value["id"] == WIKIDATA_ITEM_STATION_LOCATED_ON_SURFACE:
+                self.structure_type = "ground"
+            elif value["id"] == WIKIDATA_ITEM_STATION_LOCATED_UNDERGROUND:
+                self.structure_type = "underground"
+
+    def _extract_system(self, claims: list[dict[str, Any]]) -> None:
+        system_wikidata_id: int | None = get_item_number(claims[0])
+        if system_wikidata_id is not None:
+            self.system_wikidata_ids.add(system_wikidata_id)
+
+    def _extract_open_time(self, claims: list[dict[str, Any]]) -> None:
+        point: dict | None = get_value_or_none(claims[0])
+        if point is None:
+            logging.warning(
+                "[WIKIDATA] no value for date of official opening for Q%d",
+                self.wikidata_id,
+            )
+            return
+        try:
+            wikidata_time = WikidataTime(point)
+            self.open_time = wikidata_time.time
+            if wikidata_time.time > datetime.now(tz=timezone.utc):
+                self.status = {"type": ObjectStatus.UNDER_CONSTRUCTION}
+        except ValueError:
+            logging.warning("Invalid date: %s", point)
+
+    def _extract_geo_position(self, claims: list[dict[str, Any]]) -> None:
+        geo_structure: dict[str, float] = get_value(claims[0])
+        self.geo_position = (
+            geo_structure["latitude"],
+            geo_structure["longitude"],
+        )
+        if "altitude" in geo_structure:
+            self.altitude = geo_structure["altitude"]
+
+    def _extract_lines(self, claims: list[dict[str, Any]]) -> None:
+        for claim in claims:
+            line_wikidata_id: int | None = get_item_number(claim)
+            if line_wikidata_id is None:
                 logging.warning(
-                    "[WIKIDATA] no value for date of official opening for %s",
-                    name,
+                    "[WIKIDATA] no value for line for Q%d", self.wikidata_id
                 )
-            else:
-                point = get_value(
-                    self.claims[WIKIDATA_PROPERTY_DATE_OF_OFFICIAL_OPENING][0]
+                continue
+            if WIKIDATA_PROPERTY_END_DATE in claim.get("qualifiers", {}):
+                continue
+            self.line_wikidata_ids.append(line_wikidata_id)
+
+    def _extract_next_connections(self, claims: list[dict[str, Any]]) -> None:
+        for claim in claims:
+            next_station_wikidata_id: int | None = get_item_number(claim)
+            if next_station_wikidata_id is None:
+                logging.warning(
+                    "[WIKIDATA] no value for next station for Q%d",
+                    self.wikidata_id,
                 )
-                try:
-                    wikidata_time = WikidataTime(point)
-                    self.open_time = wikidata_time.time
-                    if wikidata_time.time > datetime.now(tz=timezone.utc):
-                        self.status = {"type": ObjectStatus.UNDER_CONSTRUCTION}
-                except ValueError:
-                    logging.warning("Invalid date: %s", point)
+                continue
 
-        self.geo_position: tuple[float, float] | None = None
-        self.altitude: float | None = None
+            # Try to assume line.
+            line_wikidata_id: int = 0
+            for qualifier in claim.get("qualifiers", {}).get(
+                WIKIDATA_PROPERTY_LINE, []
+            ):
+                line_wikidata_id = qualifier["datavalue"]["value"]["numeric-id"]
+            if len(self.line_wikidata_ids) == 1:
+                line_wikidata_id = self.line_wikidata_ids[0]
 
-        if WIKIDATA_PROPERTY_COORDINATES in self.claims:
-            geo_structure: dict[str, float] = get_value(
-                self.claims[WIKIDATA_PROPERTY_COORDINATES][0]
-            )
-            self.geo_position = (
-                geo_structure["latitude"],
-                geo_structure["longitude"],
+            self.next_connections.append(
+                (next_station_wikidata_id, line_wikidata_id)
             )
-            if "altitude" in geo_structure:
-                self.altitude = geo_structure["altitude"]
 
-        self.line_wikidata_ids: list[int] = []
-
-        if WIKIDATA_PROPERTY_LINE in self.claims:
-            for claim in self.claims[WIKIDATA_PROPERTY_LINE]:
-                if "datavalue" not in claim["mainsnak"]:
-                    logging.warning("[WIKIDATA] no value for line for %s", name)
-                    continue
-                if "qualifiers" in claim:
-                    qualifiers = claim["qualifiers"]
-                    if WIKIDATA_PROPERTY_END_DATE in qualifiers:
-                        continue
-                line_wikidata_id: int = get_value(claim)["numeric-id"]
-                self.line_wikidata_ids.append(line_wikidata_id)
-
-        self.next_connections: list[tuple[int, int]] = []
-
-        if WIKIDATA_PROPERTY_NEXT_STATION in self.claims:
-            for claim in self.claims[WIKIDATA_PROPERTY_NEXT_STATION]:
-                if "datavalue" not in claim["mainsnak"]:
-                    logging.warning(
-                        "[WIKIDATA] no value for next station for %s", name
-                    )
-                    continue
-                specified_line_wikidata_id: int | None = None
-                if "qualifiers" in claim:
-                    qualifiers = claim["qualifiers"]
-                    if WIKIDATA_PROPERTY_LINE in qualifiers:
-                        for qualifier in qualifiers[WIKIDATA_PROPERTY_LINE]:
-                            specified_line_wikidata_id: int = qualifier[
-                                "datavalue"
-                            ]["value"]["numeric-id"]
-                next_station_wikidata_id: int = get_value(claim)["numeric-id"]
-
-                # Try to assume line
-
-                line_wikidata_id = 0
-                if specified_line_wikidata_id:
-                    line_wikidata_id = specified_line_wikidata_id
-                if len(self.line_wikidata_ids) == 1:
-                    line_wikidata_id = self.line_wikidata_ids[0]
-
-                self.next_connections.append(
-                    (next_station_wikidata_id, line_wikidata_id)
+    def _extract_transition_connections(
+        self, claims: list[dict[str, Any]]
+    ) -> None:
+        for claim in claims:
+            transition_station_wikidata_id: int | None = get_item_number(claim)
+            if transition_station_wikidata_id is None:
+                logging.warning(
+                    "[WIKIDATA] no value for next station for Q%d",
+                    self.wikidata_id,
                 )
+                continue
+            self.transition_connections.append(transition_station_wikidata_id)
 
-        self.transition_connections: list[int] = []
-
-        if WIKIDATA_PROPERTY_TRANSITION_STATION in self.claims:
-            for claim in self.claims[WIKIDATA_PROPERTY_TRANSITION_STATION]:
-                if "datavalue" not in claim["mainsnak"]:
-                    logging.warning(
-                        "[WIKIDATA] no value for next station for %s", name
-                    )
-                    continue
-                transition_station_wikidata_id: int = get_value(claim)[
-                    "numeric-id"
-                ]
-                self.transition_connections.append(
-                    transition_station_wikidata_id
+    def _extract_height(self, claims: list[dict[str, Any]]) -> None:
+        for claim in claims:
+            value: dict | None = get_value_or_none(claim)
+            if value is None:
+                logging.warning(
+                    "[WIKIDATA] no value vertical depth for station"
                 )
-
-        self.height: float | None = None
-
-        if WIKIDATA_PROPERTY_VERTICAL_DEPTH in self.claims:
-            for claim in self.claims[WIKIDATA_PROPERTY_VERTICAL_DEPTH]:
-                if "datavalue" not in claim["mainsnak"]:
-                    logging.warning(
-                        "[WIKIDATA] no value vertical depth for station"
-                    )
-                    continue
-                if get_value(claim)["unit"].endswith(WIKIDATA_ITEM_METER):
-                    self.height = -float(get_value(claim)["amount"])
-                else:
-                    logging.warning(
-                        "unsupported unit %s", get_value(claim)["unit"]
-                    )
-
-        self.stations: list[Station] = []
+                continue
+            if value["unit"].endswith(WIKIDATA_ITEM_METER):
+                self.height = -float(value["amount"])
+            else:
+                logging.warning("unsupported unit %s", value["unit"])
+
+    # Lines are extracted before next stations, because the line of the
+    # connection is assumed from them.
+    claim_handlers: ClassVar[dict[str, ClaimHandler]] = {
+        WIKIDATA_PROPERTY_INSTANCE_OF: _extract_structure_type,
+        WIKIDATA_PROPERTY_PART_OF: _extract_system,
+        WIKIDATA_PROPERTY_TRANSPORT_NETWORK: _extract_system,
+        WIKIDATA_PROPERTY_DATE_OF_OFFICIAL_OPENING: _extract_open_time,
+        WIKIDATA_PROPERTY_COORDINATES: _extract_geo_position,
+        WIKIDATA_PROPERTY_LINE: _extract_lines,
+        WIKIDATA_PROPERTY_NEXT_STATION: _extract_next_connections,
+        WIKIDATA_PROPERTY_TRANSITION_STATION: _extract_transition_connections,
+        WIKIDATA_PROPERTY_VERTICAL_DEPTH: _extract_height,
+    }
 
     def fill_station(self, station: Station) -> None:
         """Fill station object with data from Wikidata station item."""
 
-        station.set_names(self.names)
+        station.set_names(self.get_output_names())
+        station.wikidata_id = self.wikidata_id
         station.geo_position = self.geo_position
         station.open_time = self.open_time
         station.site_links = self.site_links
@@ -389,58 +623,54 @@ class WikidataStationItem(WikidataItem):
 class WikidataLineItem(WikidataItem):
     """Wikidata item that describes transport line."""
 
+    __slots__: tuple[str, ...] = ("color", "id_", "system_wikidata_id")
+
     def __init__(
         self,
         structure: dict[str, Any],
         wikidata_id: int,
         local_languages: list[str] | None = None,
+        languages: AbstractSet[str] | None = None,
     ) -> None:
-        super().__init__(structure, wikidata_id)
+        super().__init__(structure, wikidata_id, languages)
 
         self.id_: str | None = data.compute_line_id(self.names, local_languages)
-
         self.color: str | None = None
-
-        if WIKIDATA_PROPERTY_COLOR in self.claims:
-            self.color = "#" + get_value(
-                self.claims[WIKIDATA_PROPERTY_COLOR][0]
-            )
-
-        if (
-            WIKIDATA_PROPERTY_COMPLEX_COLOR in self.claims
-            and "qualifiers" in self.claims[WIKIDATA_PROPERTY_COMPLEX_COLOR][0]
-        ):
-            for qualifier in self.claims[WIKIDATA_PROPERTY_COMPLEX_COLOR][0][
-                "qualifiers"
-            ]:
-                if qualifier == WIKIDATA_PROPERTY_COLOR:
-                    self.color = (
-                        "#"
-                        + self.claims[WIKIDATA_PROPERTY_COMPLEX_COLOR][0][
-                            "qualifiers"
-                        ][WIKIDATA_PROPERTY_COLOR][0]["datavalue"]["value"]
-                    )
-
         self.system_wikidata_id: int | None = None
 
-        if WIKIDATA_PROPERTY_PART_OF in self.claims:
-            self.system_wikidata_id = get_value(
-                self.claims[WIKIDATA_PROPERTY_PART_OF][0]
-            )["numeric-id"]
+        self.extract_claims()
+
+    def _extract_color(self, claims: list[dict[str, Any]]) -> None:
+        self.color = "#" + get_value(claims[0])
 
-        if WIKIDATA_PROPERTY_TRANSPORT_NETWORK in self.claims:
-            self.system_wikidata_id = get_value(
-                self.claims[WIKIDATA_PROPERTY_TRANSPORT_NETWORK][0]
-            )["numeric-id"]
+    def _extract_complex_color(self, claims: list[dict[str, Any]]) -> None:
+        colors: list[dict] = (
+            claims[0].get("qualifiers", {}).get(WIKIDATA_PROPERTY_COLOR, [])
+        )
+        if colors:
+            self.color = "#" + colors[0]["datavalue"]["value"]
+
+    def _extract_system(self, claims: list[dict[str, Any]]) -> None:
+        system_wikidata_id: int | None = get_item_number(claims[0])
+        if system_wikidata_id is not None:
+            self.system_wikidata_id = system_wikidata_id
+
+    # Complex color overrides color, and transport network overrides the
+    # system the line is part of.
+    claim_handlers: ClassVar[dict[str, ClaimHandler]] = {
+        WIKIDATA_PROPERTY_COLOR: _extract_color,
+        WIKIDATA_PROPERTY_COMPLEX_COLOR: _extract_complex_color,
+        WIKIDATA_PROPERTY_PART_OF: _extract_system,
+        WIKIDATA_PROPERTY_TRANSPORT_NETWORK: _extract_system,
+    }
 
     def create_line(self) -> Line:
         """Create new line object from line Wikidata item."""
         line = Line({}, self.id_)
         if self.color:  # and not line.has_color():
             line.color = self.color
-        for language in self.names:
-            name = data.extract_line_name(self.names[language], language)
-            line.set_name(language, name)
+        for language, line_name in self.get_output_names().items():
+            line.set_name(language, data.extract_line_name(line_name, language))
         return line
 
     def fill_line(self, line: Line) -> None:
@@ -450,36 +680,414 @@ class WikidataLineItem(WikidataItem):
         """
         if self.color:  # and not line.has_color():
             line.color = self.color
-        for language in self.names:
-            name = data.extract_line_name(self.names[language], language)
-            line.set_name(language, name)
+        for language, line_name in self.get_output_names().items():
+            line.set_name(language, data.extract_line_name(line_name, language))
 
 
 class WikidataSystemItem(WikidataItem):
     """Wikidata item that describes transport system."""
 
+    __slots__: tuple[str, ...] = ()
+
 
 @dataclass
 class WikidataParser:
-    """Parser for Wikidata."""
+    """Parser for Wikidata.
+
+    One parser may be used from several threads at the same time.
+    """
 
     cache_directory: Path
 
-    def parse_wikidata(self, wikidata_id: int) -> dict | None:
-        """Parse Wikidata item by its ID."""
-        parameters = {
+    # Session is shared by all requests of the parser, so that a long crawl
+    # reuses a few open connections.
+    session: network.Session = field(
+        default_factory=network.get_default_session
+    )
+
+    # Address of the Wikidata API, may be changed to a local mock server.
+    api_address: str = WIKIDATA_API_ADDRESS
+
+    # Check whether cached items were changed since they were downloaded.
+    revalidate: bool = False
+
+    # Cache type: `file` for compressed files or `sqlite` for one SQLite
+    # database in the cache directory.
+    cache_backend: str = "file"
+
+    # Maximum total size of the cache in bytes and maximum age of cached items
+    # in seconds, see `Cache.evict`.
+    cache_max_bytes: int | None = None
+    cache_max_age: float | None = None
+
+    # If specified, request only labels, descriptions, and site links in these
+    # languages and `PARSING_LANGUAGES`, and no aliases, instead of full
+    # entities.
+    languages: list[str] | None = None
+
+    # Store only claims with `SLIM_PROPERTIES` and without references.
+    slim: bool = False
+
+    # Maximum number of decoded item structures kept in memory, so that items
+    # parsed again are not read from the cache and decoded.  Least recently
+    # used structures are forgotten first.  `0` disables the memory.
+    memory_size: int = DEFAULT_MEMORY_SIZE
+
+    # Items that are already revalidated during this run, guarded by
+    # `revalidation_lock`.
+    revalidated_wikidata_ids: set[int] = field(
+        default_factory=set, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        self.cache: Cache = create_cache(
+            self.cache_backend,
+            self.cache_directory,
+            self.cache_max_bytes,
+            self.cache_max_age,
+        )
+
+        # Decoded item structures.  They are shared by all callers and must not
+        # be modified.
+        self.memory: OrderedDict[int, dict] = OrderedDict()
+        self.memory_stats: CacheStats = CacheStats()
+        self.memory_lock: threading.Lock = threading.Lock()
+
+        # Only one thread revalidates items at a time, so that other threads
+        # never read items that are being revalidated.
+        self.revalidation_lock: threading.Lock = threading.Lock()
+
+        # Short identifier of the requested entity parts, `None` for full
+        # entities.
+        self.projection: str | None = None
+        descriptions: list[str] = []
+        if self.languages is not None:
+            self.languages = sorted({*self.languages, *PARSING_LANGUAGES})
+            descriptions.append(
+                "|".join(WIKIDATA_PROJECTION_PROPS)
+                + ";"
+                + "|".join(self.languages)
+            )
+        if self.slim:
+            descriptions.append(
+                f"slim{SLIM_VERSION};" + "|".join(sorted(SLIM_PROPERTIES))
+            )
+        if descriptions:
+            self.projection = hashlib.sha1(  # noqa: S324
+                ";".join(descriptions).encode()
+            ).hexdigest()[:8]
+
+    def get_cache_key(self, wikidata_id: int) -> str:
+        """Get key of Wikidata item in the cache.
+
+        Full and projected entities are stored under different keys, e.g.
+        `Q123` and `Q123.5f2a4b1c`, so that they never get mixed up.
+        """
+        key: str = WIKIDATA_ITEM_PREFIX + str(wikidata_id)
+        return f"{key}.{self.projection}" if self.projection else key
+
+    def get_parameters(self, wikidata_ids: Iterable[int]) -> dict[str, str]:
+        """Get parameters of `wbgetentities` request for Wikidata items."""
+
+        parameters: dict[str, str] = {
             "action": "wbgetentities",
             "format": "json",
-            "ids": WIKIDATA_ITEM_PREFIX + str(wikidata_id),
+            "maxlag": str(WIKIDATA_MAXLAG),
+            "ids": "|".join(
+                WIKIDATA_ITEM_PREFIX + str(x) for x in wikidata_ids
+            ),
         }
+        if self.languages is not None:
+            parameters["props"] = "|".join(WIKIDATA_PROJECTION_PROPS)
+            parameters["languages"] = "|".join(self.languages)
+            parameters["sitefilter"] = "|".join(
+                get_site(x) for x in self.languages
+            )
+        return parameters
+
+    def project(self, entity: dict[str, Any]) -> dict[str, Any]:
+        """Remove entity parts that are not requested by the parser.
+
+        Entities read from a dump are projected the same way, so that they
+        are the same as the requested ones.  Claims of slim entities are
+        pruned here, because the API cannot filter them.
+        """
+        if self.slim and "claims" in entity:
+            entity = entity | {"claims": self.prune_claims(entity)}
+        if self.languages is None:
+            return entity
+
+        languages: set[str] = set(self.languages)
+        sites: set[str] = {get_site(x) for x in languages}
+        projected: dict[str, Any] = {}
+
+        key: str
+        for key, value in entity.items():
+            if key in ("labels", "descriptions"):
+                projected[key] = {
+                    x: y for x, y in value.items() if x in languages
+                }
+            elif key == "sitelinks":
+                projected[key] = {x: y for x, y in value.items() if x in sites}
+            elif key != "aliases":
+                projected[key] = value
+
+        return projected
+
+    @staticmethod
+    def prune_claims(entity: dict[str, Any]) -> dict[str, list[dict]]:
+        """Get entity claims with `SLIM_PROPERTIES` only."""
+
+        claims: dict[str, list[dict]] = {}
+
+        property_: str
+        for property_, values in entity["claims"].items():
+            if property_ not in SLIM_PROPERTIES:
+                continue
+            claims[property_] = []
+            for claim in values:
+                pruned: dict[str, Any] = {
+                    x: claim[x] for x in SLIM_CLAIM_KEYS if x in claim
+                }
+                if "qualifiers" in pruned:
+                    pruned["qualifiers"] = {
+                        x: y
+                        for x, y in pruned["qualifiers"].items()
+                        if x in SLIM_PROPERTIES
+                    }
+                claims[property_].append(pruned)
+
+        return claims
+
+    def pin(self, wikidata_ids: Iterable[int]) -> None:
+        """Exclude Wikidata items from cache eviction."""
+        self.cache.pinned.update(self.get_cache_key(x) for x in wikidata_ids)
+
+    def parse_wikidata(
+        self, wikidata_id: int, *, refresh: bool = False
+    ) -> dict | None:
+        """Parse Wikidata item by its ID."""
+        return self.parse_wikidata_many([wikidata_id], refresh=refresh)[
+            wikidata_id
+        ]
+
+    def parse_wikidata_many(
+        self, wikidata_ids: Iterable[int], *, refresh: bool = False
+    ) -> dict[int, dict | None]:
+        """Parse several Wikidata items by their IDs.
+
+        Items that are not cached yet are requested in batches of
+        `WIKIDATA_BATCH_SIZE` items per request.  The response is split into
+        per-item structures, so the cache contains exactly the same files as
+        if the items were requested one by one.
+
+        :param wikidata_ids: Wikidata item unique identifiers
+        :param refresh: request all items, even cached ones, and replace the
+            cached items
+        :return: map from Wikidata item identifier to its structure or `None`
+            if the item cannot be parsed
+        """
+        wikidata_ids = list(dict.fromkeys(wikidata_ids))
+        if self.revalidate and not refresh:
+            self.revalidate_many(wikidata_ids)
+
+        structures: dict[int, dict | None] = (
+            {} if refresh else self.recall(wikidata_ids)
+        )
+        to_read: list[int] = (
+            [] if refresh else [x for x in wikidata_ids if x not in structures]
+        )
+        to_request: list[int] = wikidata_ids if refresh else []
+
+        cached: dict[str, bytes] = self.cache.read_many(
+            self.get_cache_key(x) for x in to_read
+        )
+        wikidata_id: int
+        for wikidata_id in to_read:
+            content: bytes | None = cached.get(self.get_cache_key(wikidata_id))
+            if content is not None:
+                structure: dict = json_backend.loads(content)
+                structures[wikidata_id] = structure
+                self.remember(wikidata_id, structure)
+            else:
+                to_request.append(wikidata_id)
+
+        for index in range(0, len(to_request), WIKIDATA_BATCH_SIZE):
+            batch: list[int] = to_request[index : index + WIKIDATA_BATCH_SIZE]
+            structures |= self._request_batch(batch)
+
+        return structures
+
+    def recall(self, wikidata_ids: Iterable[int]) -> dict[int, dict | None]:
+        """Get decoded structures of items from memory."""
+
+        structures: dict[int, dict | None] = {}
+        with self.memory_lock:
+            for wikidata_id in wikidata_ids:
+                structure: dict | None = self.memory.get(wikidata_id)
+                if structure is None:
+                    self.memory_stats.misses += 1
+                    continue
+                self.memory_stats.hits += 1
+                self.memory.move_to_end(wikidata_id)
+                structures[wikidata_id] = structure
+        return structures
+
+    def remember(self, wikidata_id: int, structure: dict) -> None:
+        """Keep decoded item structure in memory."""
+
+        if not self.memory_size:
+            return
+        with self.memory_lock:
+            self.memory[wikidata_id] = structure
+            self.memory.move_to_end(wikidata_id)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+                self.memory_stats.evicted += 1
+
+    def forget(self, wikidata_id: int) -> None:
+        """Remove item structure from memory."""
+
+        with self.memory_lock:
+            self.memory.pop(wikidata_id, None)
+
+    def revalidate_many(self, wikidata_ids: Iterable[int]) -> list[int]:
+        """Remove cached items that were changed since they were downloaded.
+
+        Only revision information of the items is requested, in batches of
+        `WIKIDATA_BATCH_SIZE` items per request.  Every item is checked at most
+        once per parser.
+
+        Items whose revision cannot be requested are checked again on the next
+        call.
+
+        :param wikidata_ids: Wikidata item unique identifiers
+        :return: identifiers of outdated items
+        """
+        with self.revalidation_lock:
+            return self._revalidate_many(wikidata_ids)
+
+    def _revalidate_many(self, wikidata_ids: Iterable[int]) -> list[int]:
+        """Remove outdated cached items, see `revalidate_many`."""
+        cached: dict[int, int | None] = {}
+
+        to_check: list[int] = [
+            x for x in wikidata_ids if x not in self.revalidated_wikidata_ids
+        ]
+
+        # Use revisions stored by the cache, and decode only entries without
+        # them.
+        revisions: dict[str, int] = self.cache.read_revisions(
+            self.get_cache_key(x) for x in to_check
+        )
+        wikidata_id: int
+        for wikidata_id in to_check:
+            if (key := self.get_cache_key(wikidata_id)) in revisions:
+                cached[wikidata_id] = revisions[key]
+
+        to_read: list[int] = [x for x in to_check if x not in cached]
+        contents: dict[str, bytes] = self.cache.read_many(
+            self.get_cache_key(x) for x in to_read
+        )
+        for wikidata_id in to_read:
+            content: bytes | None = contents.get(
+                self.get_cache_key(wikidata_id)
+            )
+            if content is not None:
+                cached[wikidata_id] = get_revision(json_backend.loads(content))
+
+        # Items that are not cached are downloaded now, so they are up to
+        # date.
+        self.revalidated_wikidata_ids.update(
+            x for x in to_check if x not in cached
+        )
+
+        outdated: list[int] = []
+        ids: list[int] = list(cached)
+
+        for index in range(0, len(ids), WIKIDATA_BATCH_SIZE):
+            batch: list[int] = ids[index : index + WIKIDATA_BATCH_SIZE]
+            parameters = {
+                "action": "wbgetentities",
+                "format": "json",
+                "maxlag": str(WIKIDATA_MAXLAG),
+                "props": "info",
+                "ids": "|".join(WIKIDATA_ITEM_PREFIX + str(x) for x in batch),
+            }
+            content: bytes | None = network.get(
+                self.api_address, parameters, session=self.session
+            )
+            if content is None:
+                logging.warning("cannot revalidate %d items", len(batch))
+                continue
+            self.revalidated_wikidata_ids.update(batch)
+            revisions: dict[int, int | None] = {
+                get_requested_wikidata_id(x, y): y.get("lastrevid")
+                for x, y in json_backend.loads(content)
+                .get("entities", {})
+                .items()
+            }
+            confirmed: list[str] = []
+            for wikidata_id in batch:
+                revision: int | None = revisions.get(wikidata_id)
+                if revision is None or revision != cached[wikidata_id]:
+                    self.cache.delete(self.get_cache_key(wikidata_id))
+                    self.forget(wikidata_id)
+                    outdated.append(wikidata_id)
+                else:
+                    confirmed.append(self.get_cache_key(wikidata_id))
+            # Up-to-date items are as good as just downloaded ones.
+            self.cache.touch(confirmed)
+
+        if outdated:
+            logging.info("%d of %d items are outdated", len(outdated), len(ids))
+        return outdated
+
+    def _request_batch(self, wikidata_ids: list[int]) -> dict[int, dict | None]:
+        """Request Wikidata items with one request and cache them."""
+
         content: bytes | None = network.get(
-            "www.wikidata.org/w/api.php",
-            parameters,
-            self.cache_directory / (WIKIDATA_ITEM_PREFIX + str(wikidata_id)),
+            self.api_address,
+            self.get_parameters(wikidata_ids),
+            session=self.session,
         )
+        structures: dict[int, dict | None] = dict.fromkeys(wikidata_ids)
         if content is None:
-            return None
-        return json.loads(content.decode())
+            return structures
+
+        entities: dict[str, dict] = json_backend.loads(content).get(
+            "entities", {}
+        )
+        key: str
+        entity: dict[str, Any]
+        for key, entity in entities.items():
+            wikidata_id: int = get_requested_wikidata_id(key, entity)
+            if wikidata_id not in structures:
+                logging.warning("unexpected Wikidata entity %s", key)
+                continue
+            structures[wikidata_id] = self.store(wikidata_id, entity)
+
+        return structures
+
+    def store(self, wikidata_id: int, entity: dict[str, Any]) -> dict:
+        """Put Wikidata entity into the cache.
+
+        :param wikidata_id: requested Wikidata item identifier, it differs from
+            the entity identifier if the item is redirected
+        :param entity: Wikidata entity
+        :return: Wikidata item structure, as returned by `parse_wikidata`
+        """
+        entity = self.project(entity)
+        structure: dict = {
+            "entities": {WIKIDATA_ITEM_PREFIX + str(wikidata_id): entity}
+        }
+        self.cache.write(
+            self.get_cache_key(wikidata_id),
+            json_backend.dumps(structure),
+            entity.get("lastrevid"),
+        )
+        self.remember(wikidata_id, structure)
+        return structure
 
 
 class WikidataCityParser:
@@ -493,10 +1101,20 @@ class WikidataCityParser:
         wikidata_init_ids: list[int],
         wikidata_id: int,
         network_update: list[str],
+        checkpoint_path: Path | None = None,
     ) -> None:
+        """Initialize parser.
+
+        :param checkpoint_path: if specified, crawl state is periodically saved
+            to this file, so that an interrupted crawl may be resumed
+        """
         self.wikidata_parser: WikidataParser = wikidata_parser
         self.network_update: list[str] = network_update
+        self.network_update_patterns: list[re.Pattern] = [
+            re.compile(x) for x in network_update
+        ]
         self.wikidata_id: int = wikidata_id
+        self.checkpoint_path: Path | None = checkpoint_path
 
         self.parsed_station_wikidata_ids: set[int] = set()
         self.to_parse_station_wikidata_ids: set[int] = set(wikidata_init_ids)
@@ -504,8 +1122,25 @@ class WikidataCityParser:
         self.parsed_line_wikidata_ids: set[int] = set()
         self.to_parse_line_wikidata_ids: set[int] = set()
 
+        # Stations that cannot be requested, they are requested again on
+        # resume.
+        self.failed_station_wikidata_ids: set[int] = set()
+
+        # Number of parsed stations and processed batches.
+        self.count: int = 0
+        self.batch_count: int = 0
+
+        # Structures of lines requested by batches, so that batches requested
+        # at the same time do not request the same lines.  Guarded by
+        # `line_lock`.
+        self.line_futures: dict[int, Future] = {}
+        self.line_lock: threading.Lock = threading.Lock()
+
         self.map: Map = map_
 
+        # Languages of names, descriptions, and site links kept in items.
+        self.languages: frozenset[str] | None = map_.get_languages()
+
         self.systems_dict: dict[int, System] = {}
 
         system_wikidata_id: int
@@ -514,8 +1149,67 @@ class WikidataCityParser:
                 systems_dict[system_wikidata_id]
             ]
 
-    def parse(self, limit: int | None = None) -> None:
-        """Parse transport data for the city from Wikidata."""
+    def _is_of_interest(self, station_item: WikidataStationItem) -> bool:
+        """Check whether the station is a part of systems of interest.
+
+        If it is, add its neighbours to the frontier.
+        """
+        is_system_of_interest: bool = False
+
+        system_wikidata_id: int
+        for system_wikidata_id in station_item.system_wikidata_ids:
+            if system_wikidata_id in self.systems_dict:
+                is_system_of_interest = True
+                break
+
+        line_wikidata_id: int
+        for line_wikidata_id in station_item.line_wikidata_ids:
+            if line_wikidata_id in self.systems_dict:
+                is_system_of_interest = True
+                break
+
+        if not is_system_of_interest:
+            logging.info(
+                "not interested in %s, because it is part of systems %s",
+                station_item.get_any_name(),
+                station_item.system_wikidata_ids,
+            )
+            return False
+
+        # Add station IDs to parse in the future.
+
+        other_id: int
+        for other_id in station_item.transition_connections:
+            if (
+                other_id not in self.parsed_station_wikidata_ids
+                and other_id not in self.to_parse_station_wikidata_ids
+            ):
+                self.to_parse_station_wikidata_ids.add(other_id)
+
+        for other_id, _ in station_item.next_connections:
+            if (
+                other_id not in self.parsed_station_wikidata_ids
+                and other_id not in self.to_parse_station_wikidata_ids
+            ):
+                self.to_parse_station_wikidata_ids.add(other_id)
+
+        return True
+
+    def parse(
+        self,
+        limit: int | None = None,
+        concurrency: int | None = None,
+        *,
+        resume: bool = False,
+    ) -> None:
+        """Parse transport data for the city from Wikidata.
+
+        :param limit: maximum number of stations to parse
+        :param concurrency: if specified, crawl with that many concurrent
+            requests using asyncio
+        :param resume: continue the crawl from the checkpoint file if it
+            exists
+        """
 
         # TODO(enzet): Add filter, so we can parse only stations of one line, or
         # at least of one city.
@@ -526,95 +1220,483 @@ class WikidataCityParser:
             structure = self.wikidata_parser.parse_wikidata(self.wikidata_id)
             if structure is not None:
                 item: WikidataSystemItem = WikidataSystemItem(
-                    structure, self.wikidata_id
+                    structure, self.wikidata_id, self.languages
                 )
-                self.map.names = item.names
+                self.map.names = item.get_output_names()
 
         # Preprocessing: get all Wikidata items we need.
 
-        # Map Wikidata ids to Wikidata page descriptions.
         station_items: dict[int, WikidataStationItem] = {}
         line_items: dict[int, WikidataLineItem] = {}
+        if resume:
+            station_items, line_items = self.load_checkpoint()
+
+        if concurrency:
+            asyncio.run(
+                self.crawl_async(limit, concurrency, station_items, line_items)
+            )
+        else:
+            self.crawl(limit, station_items, line_items)
+
+        if self.checkpoint_path:
+            if self.failed_station_wikidata_ids:
+                logging.warning(
+                    "%d stations cannot be requested, resume the crawl to "
+                    "request them again",
+                    len(self.failed_station_wikidata_ids),
+                )
+                self.save_checkpoint(station_items, line_items)
+            else:
+                self.checkpoint_path.unlink(missing_ok=True)
+
+        # System and line items are requested on every run, so they should stay
+        # in the cache.
+        self.wikidata_parser.pin(
+            [self.wikidata_id, *self.systems_dict, *line_items]
+        )
 
-        count: int = 0
-        while len(self.to_parse_station_wikidata_ids) > 0:
-            wikidata_id: int = self.to_parse_station_wikidata_ids.pop()
+        self.build(station_items, line_items)
 
-            structure = self.wikidata_parser.parse_wikidata(wikidata_id)
-            station_item: WikidataStationItem = WikidataStationItem(
-                structure, wikidata_id
+    def crawl(
+        self,
+        limit: int | None = None,
+        station_items: dict[int, WikidataStationItem] | None = None,
+        line_items: dict[int, WikidataLineItem] | None = None,
+    ) -> tuple[dict[int, WikidataStationItem], dict[int, WikidataLineItem]]:
+        """Get all station and line Wikidata items reachable from the frontier.
+
+        :param limit: maximum number of stations to parse
+        :param station_items: already parsed station items, extended in place
+        :param line_items: already parsed line items, extended in place
+        :return: station items of the systems of interest and line items, both
+            mapped from Wikidata identifiers
+        """
+        # Map Wikidata ids to Wikidata page descriptions.
+        station_items = {} if station_items is None else station_items
+        line_items = {} if line_items is None else line_items
+
+        while self.to_parse_station_wikidata_ids:
+            batch: list[int] = self._pop_batch(WIKIDATA_BATCH_SIZE)
+            batch_items, line_structures = self._read_batch(
+                batch, self.parsed_line_wikidata_ids
             )
-            pattern: str
-            for pattern in self.network_update:
-                en_name = station_item.get_name("en")
-                if en_name and re.match(".*" + pattern + ".*", en_name):
-                    structure = self.wikidata_parser.parse_wikidata(wikidata_id)
-                    station_item = WikidataStationItem(structure, wikidata_id)
+            if not self._process_batch(
+                batch,
+                batch_items,
+                line_structures,
+                station_items,
+                line_items,
+                limit,
+            ):
+                break
+            self._save_periodic_checkpoint(station_items, line_items)
 
-            self.parsed_station_wikidata_ids.add(wikidata_id)
+        self.line_futures.clear()
+        return station_items, line_items
 
-            line_wikidata_id: int
-            for line_wikidata_id in station_item.line_wikidata_ids:
-                if line_wikidata_id not in self.parsed_line_wikidata_ids:
-                    structure = self.wikidata_parser.parse_wikidata(
-                        line_wikidata_id
+    async def crawl_async(
+        self,
+        limit: int | None = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        station_items: dict[int, WikidataStationItem] | None = None,
+        line_items: dict[int, WikidataLineItem] | None = None,
+    ) -> tuple[dict[int, WikidataStationItem], dict[int, WikidataLineItem]]:
+        """Get the same Wikidata items as `crawl`, with concurrent requests.
+
+        Up to `concurrency` batches are requested at the same time in worker
+        threads, while the frontier and the results are only changed by the
+        event loop.  Batches are as large as `wbgetentities` allows, so
+        several of them are requested at the same time only if the frontier
+        is larger than one batch.
+
+        :param limit: maximum number of stations to parse
+        :param concurrency: maximum number of batches requested at the same
+            time
+        :param station_items: already parsed station items, extended in place
+        :param line_items: already parsed line items, extended in place
+        :return: station items of the systems of interest and line items, both
+            mapped from Wikidata identifiers
+        """
+        station_items = {} if station_items is None else station_items
+        line_items = {} if line_items is None else line_items
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        tasks: dict[asyncio.Future, list[int]] = {}
+        is_limit_reached: bool = False
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while tasks or (
+                self.to_parse_station_wikidata_ids and not is_limit_reached
+            ):
+                # Give full batches of the frontier to free workers.
+                while (
+                    self.to_parse_station_wikidata_ids
+                    and not is_limit_reached
+                    and len(tasks) < concurrency
+                ):
+                    batch: list[int] = self._pop_batch(WIKIDATA_BATCH_SIZE)
+                    task: asyncio.Future = loop.run_in_executor(
+                        executor,
+                        self._read_batch,
+                        batch,
+                        frozenset(self.parsed_line_wikidata_ids),
                     )
-                    line_item: WikidataLineItem = WikidataLineItem(
-                        structure, line_wikidata_id, self.map.local_languages
+                    tasks[task] = batch
+
+                done, _ = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    batch = tasks.pop(task)
+                    if is_limit_reached:
+                        self._return_to_frontier(batch)
+                        continue
+                    batch_items, line_structures = task.result()
+                    if not self._process_batch(
+                        batch,
+                        batch_items,
+                        line_structures,
+                        station_items,
+                        line_items,
+                        limit,
+                    ):
+                        is_limit_reached = True
+                    self._save_periodic_checkpoint(
+                        station_items, line_items, tasks.values()
                     )
-                    line_items[line_wikidata_id] = line_item
-                    self.parsed_line_wikidata_ids.add(line_wikidata_id)
 
-            count += 1
-            if limit and count > limit:
-                break
+        self.line_futures.clear()
+        return station_items, line_items
+
+    def _save_periodic_checkpoint(
+        self,
+        station_items: dict[int, WikidataStationItem],
+        line_items: dict[int, WikidataLineItem],
+        pending_batches: Iterable[list[int]] = (),
+    ) -> None:
+        """Save checkpoint after every `CHECKPOINT_STEP` processed batches."""
+
+        self.batch_count += 1
+        if self.checkpoint_path and self.batch_count % CHECKPOINT_STEP == 0:
+            self.save_checkpoint(station_items, line_items, pending_batches)
+
+    def save_checkpoint(
+        self,
+        station_items: dict[int, WikidataStationItem],
+        line_items: dict[int, WikidataLineItem],
+        pending_batches: Iterable[list[int]] = (),
+    ) -> None:
+        """Save crawl state to the checkpoint file.
+
+        Only identifiers are saved: items are read again from the cache on
+        resume.
+
+        :param station_items: parsed station items
+        :param line_items: parsed line items
+        :param pending_batches: batches that are requested, but not processed
+            yet, they are saved as not parsed
+        """
+        pending: set[int] = {x for batch in pending_batches for x in batch}
+        state: dict[str, Any] = {
+            "version": CHECKPOINT_VERSION,
+            "wikidata_id": self.wikidata_id,
+            "count": self.count,
+            "to_parse_stations": sorted(
+                self.to_parse_station_wikidata_ids
+                | self.failed_station_wikidata_ids
+                | pending
+            ),
+            "parsed_stations": sorted(
+                self.parsed_station_wikidata_ids - pending
+            ),
+            "parsed_lines": sorted(self.parsed_line_wikidata_ids),
+            "stations": sorted(station_items),
+            "lines": sorted(line_items),
+        }
+        # Replace the file atomically, so that an interrupted write does not
+        # corrupt the previous checkpoint.
+        write_atomically(self.checkpoint_path, json_backend.dumps(state))
+
+    def load_checkpoint(
+        self,
+    ) -> tuple[dict[int, WikidataStationItem], dict[int, WikidataLineItem]]:
+        """Restore crawl state from the checkpoint file.
+
+        :return: station and line items parsed before the checkpoint, empty if
+            there is no checkpoint for this crawl
+        """
+        if not self.checkpoint_path or not self.checkpoint_path.exists():
+            return {}, {}
+
+        state: dict[str, Any] = json_backend.loads(
+            self.checkpoint_path.read_bytes()
+        )
+        if (
+            state.get("version") != CHECKPOINT_VERSION
+            or state.get("wikidata_id") != self.wikidata_id
+        ):
+            logging.warning(
+                "checkpoint %s is not compatible, starting from scratch",
+                self.checkpoint_path,
+            )
+            return {}, {}
+
+        self.count = state["count"]
+        self.to_parse_station_wikidata_ids = set(state["to_parse_stations"])
+        self.parsed_station_wikidata_ids = set(state["parsed_stations"])
+        self.parsed_line_wikidata_ids = set(state["parsed_lines"])
 
+        line_structures: dict[int, dict | None] = (
+            self.wikidata_parser.parse_wikidata_many(state["lines"])
+        )
+        line_items: dict[int, WikidataLineItem] = {}
+
+        wikidata_id: int
+        for wikidata_id, structure in line_structures.items():
+            if structure is None:
+                self.parsed_line_wikidata_ids.discard(wikidata_id)
+                continue
+            line_items[wikidata_id] = WikidataLineItem(
+                structure,
+                wikidata_id,
+                self.map.local_languages,
+                self.languages,
+            )
+            line_items[wikidata_id].release()
+
+        station_structures: dict[int, dict | None] = (
+            self.wikidata_parser.parse_wikidata_many(state["stations"])
+        )
+        station_items: dict[int, WikidataStationItem] = {}
+        for wikidata_id, structure in station_structures.items():
+            station_item: WikidataStationItem | None = (
+                None
+                if structure is None
+                else WikidataStationItem(structure, wikidata_id, self.languages)
+            )
+            if station_item is None or any(
+                x not in line_items for x in station_item.line_wikidata_ids
+            ):
+                self._return_to_frontier([wikidata_id])
+                continue
             for line_wikidata_id in station_item.line_wikidata_ids:
                 station_item.system_wikidata_ids.add(
                     line_items[line_wikidata_id].system_wikidata_id
                 )
+            station_item.release()
+            station_items[wikidata_id] = station_item
 
-            # If this station is not the part of systems of interest, skip it.
+        logging.info(
+            "resuming crawl: %d stations parsed, %d to parse",
+            len(self.parsed_station_wikidata_ids),
+            len(self.to_parse_station_wikidata_ids),
+        )
+        return station_items, line_items
 
-            is_system_of_interest: bool = False
+    def _pop_batch(self, size: int) -> list[int]:
+        """Take station identifiers from the frontier and mark them parsed."""
 
-            system_wikidata_id: int
-            for system_wikidata_id in station_item.system_wikidata_ids:
-                if system_wikidata_id in self.systems_dict:
-                    is_system_of_interest = True
-                    break
+        batch: list[int] = [
+            self.to_parse_station_wikidata_ids.pop()
+            for _ in range(min(size, len(self.to_parse_station_wikidata_ids)))
+        ]
+        self.parsed_station_wikidata_ids.update(batch)
+        self.failed_station_wikidata_ids.difference_update(batch)
+        return batch
 
-            for line_wikidata_id in station_item.line_wikidata_ids:
-                if line_wikidata_id in self.systems_dict:
-                    is_system_of_interest = True
-                    break
-
-            if not is_system_of_interest:
-                logging.info(
-                    "not interested in %s, because it is part of systems %s",
-                    station_item.get_any_name(),
-                    station_item.system_wikidata_ids,
+    def _return_to_frontier(self, wikidata_ids: list[int]) -> None:
+        """Return not processed station identifiers back to the frontier."""
+
+        self.parsed_station_wikidata_ids.difference_update(wikidata_ids)
+        self.to_parse_station_wikidata_ids.update(wikidata_ids)
+
+    def _read_batch(
+        self, batch: list[int], known_line_wikidata_ids: AbstractSet[int]
+    ) -> tuple[dict[int, WikidataStationItem], dict[int, dict | None]]:
+        """Get station items of the batch and structures of their new lines.
+
+        This method does not change the state of the parser, so it may be
+        called from several threads at the same time.
+
+        :param batch: station Wikidata identifiers
+        :param known_line_wikidata_ids: lines that should not be requested
+        :return: station items and line structures, both mapped from Wikidata
+            identifiers
+        """
+        structures: dict[int, dict | None] = (
+            self.wikidata_parser.parse_wikidata_many(batch)
+        )
+        batch_items: dict[int, WikidataStationItem] = {}
+
+        wikidata_id: int
+        for wikidata_id in batch:
+            # The item is missing from the result if it cannot be requested.
+            if structures[wikidata_id] is not None:
+                batch_items[wikidata_id] = WikidataStationItem(
+                    structures[wikidata_id], wikidata_id, self.languages
                 )
+
+        # Request stations selected for update again, all at once.  If the
+        # request fails, the cached station is used.
+
+        if to_update := [
+            x for x, y in batch_items.items() if self.is_update_requested(y)
+        ]:
+            updated: dict[int, dict | None] = (
+                self.wikidata_parser.parse_wikidata_many(
+                    to_update, refresh=True
+                )
+            )
+            for wikidata_id, structure in updated.items():
+                if structure is not None:
+                    batch_items[wikidata_id] = WikidataStationItem(
+                        structure, wikidata_id, self.languages
+                    )
+
+        line_wikidata_ids: list[int] = list(
+            dict.fromkeys(
+                line_wikidata_id
+                for station_item in batch_items.values()
+                for line_wikidata_id in station_item.line_wikidata_ids
+                if line_wikidata_id not in known_line_wikidata_ids
+            )
+        )
+        return batch_items, self._read_lines(line_wikidata_ids)
+
+    def _read_lines(
+        self, line_wikidata_ids: list[int]
+    ) -> dict[int, dict | None]:
+        """Get line structures, requesting each line only once at a time.
+
+        Lines that are not requested by other batches are requested at once.
+        Lines requested by other batches are not requested again: their
+        structures are waited for.  Lines that cannot be requested are
+        forgotten, so that later batches request them again.
+
+        :param line_wikidata_ids: line Wikidata identifiers
+        :return: line structures mapped from Wikidata identifiers, `None` if
+            the line cannot be requested
+        """
+        own_futures: dict[int, Future] = {}
+        futures: dict[int, Future] = {}
+        with self.line_lock:
+            for wikidata_id in line_wikidata_ids:
+                if wikidata_id not in self.line_futures:
+                    own_futures[wikidata_id] = Future()
+                    self.line_futures[wikidata_id] = own_futures[wikidata_id]
+                futures[wikidata_id] = self.line_futures[wikidata_id]
+
+        if own_futures:
+            try:
+                structures: dict[int, dict | None] = (
+                    self.wikidata_parser.parse_wikidata_many(own_futures)
+                )
+            except BaseException as error:
+                with self.line_lock:
+                    for wikidata_id, future in own_futures.items():
+                        del self.line_futures[wikidata_id]
+                        future.set_exception(error)
+                raise
+            with self.line_lock:
+                for wikidata_id, future in own_futures.items():
+                    if structures.get(wikidata_id) is None:
+                        del self.line_futures[wikidata_id]
+                    future.set_result(structures.get(wikidata_id))
+
+        return {x: y.result() for x, y in futures.items()}
+
+    def is_update_requested(self, station_item: WikidataStationItem) -> bool:
+        """Check whether the station matches one of update patterns.
+
+        Patterns are searched in station names in all languages, in station
+        Wikidata identifier, e.g. `Q123`, and in Wikidata identifiers of its
+        lines.
+        """
+        if not self.network_update_patterns:
+            return False
+
+        texts: list[str] = [
+            *station_item.names.values(),
+            WIKIDATA_ITEM_PREFIX + str(station_item.wikidata_id),
+            *(
+                WIKIDATA_ITEM_PREFIX + str(x)
+                for x in station_item.line_wikidata_ids
+            ),
+        ]
+        return any(
+            pattern.search(text)
+            for pattern in self.network_update_patterns
+            for text in texts
+        )
+
+    def _process_batch(
+        self,
+        batch: list[int],
+        batch_items: dict[int, WikidataStationItem],
+        line_structures: dict[int, dict | None],
+        station_items: dict[int, WikidataStationItem],
+        line_items: dict[int, WikidataLineItem],
+        limit: int | None,
+    ) -> bool:
+        """Add items of the batch to the result and extend the frontier.
+
+        Stations that cannot be requested, or whose lines cannot be requested,
+        are marked as failed instead of parsed.
+
+        :return: false if the limit of parsed stations is reached
+        """
+        index: int
+        wikidata_id: int
+        for index, wikidata_id in enumerate(batch):
+            station_item: WikidataStationItem | None = batch_items.get(
+                wikidata_id
+            )
+            if station_item is None or any(
+                x not in self.parsed_line_wikidata_ids
+                and line_structures.get(x) is None
+                for x in station_item.line_wikidata_ids
+            ):
+                logging.warning("cannot request station Q%d", wikidata_id)
+                self.parsed_station_wikidata_ids.discard(wikidata_id)
+                self.failed_station_wikidata_ids.add(wikidata_id)
                 continue
 
-            station_items[wikidata_id] = station_item
+            line_wikidata_id: int
+            for line_wikidata_id in station_item.line_wikidata_ids:
+                if line_wikidata_id not in self.parsed_line_wikidata_ids:
+                    line_item: WikidataLineItem = WikidataLineItem(
+                        line_structures[line_wikidata_id],
+                        line_wikidata_id,
+                        self.map.local_languages,
+                        self.languages,
+                    )
+                    line_item.release()
+                    line_items[line_wikidata_id] = line_item
+                    self.parsed_line_wikidata_ids.add(line_wikidata_id)
 
-            # Add station IDs to parse in the future.
+            self.count += 1
+            if limit and self.count > limit:
+                self._return_to_frontier(batch[index + 1 :])
+                return False
 
-            other_id: int
-            for other_id in station_item.transition_connections:
-                if (
-                    other_id not in self.parsed_station_wikidata_ids
-                    and other_id not in self.to_parse_station_wikidata_ids
-                ):
-                    self.to_parse_station_wikidata_ids.add(other_id)
+            for line_wikidata_id in station_item.line_wikidata_ids:
+                station_item.system_wikidata_ids.add(
+                    line_items[line_wikidata_id].system_wikidata_id
+                )
 
-            for other_id, _ in station_item.next_connections:
-                if (
-                    other_id not in self.parsed_station_wikidata_ids
-                    and other_id not in self.to_parse_station_wikidata_ids
-                ):
-                    self.to_parse_station_wikidata_ids.add(other_id)
+            if self._is_of_interest(station_item):
+                # Only extracted fields are used from now on.
+                station_item.release()
+                station_items[wikidata_id] = station_item
+
+        return True
+
+    def build(
+        self,
+        station_items: dict[int, WikidataStationItem],
+        line_items: dict[int, WikidataLineItem],
+    ) -> None:
+        """Construct lines and stations of the systems from Wikidata items."""
 
         # Now we have all station and line Wikidata items.
 
@@ -643,7 +1725,7 @@ class WikidataCityParser:
                     lines[line_wikidata_id] = line
                 else:
                     line = line_item.create_line()
-                    system.lines[line.id_] = line
+                    system.add_line(line)
                     lines[line_wikidata_id] = line
 
         # Process stations.
@@ -681,7 +1763,7 @@ class WikidataCityParser:
             for station in item_stations:
                 other_station: Station
                 for other_station in item_stations:
-                    if station != other_station:
+                    if station is not other_station:
                         station.add_connection(
                             other_station, ConnectionType.TRANSITION
                         )
@@ -707,7 +1789,7 @@ class WikidataCityParser:
                 for station in station_item.stations:
                     for other_station in other_station_item.stations:
                         if (
-                            station.line == other_station.line
+                            station.line is other_station.line
                             or not common_lines
                         ):
                             station.add_connection(
@@ -728,13 +1810,13 @@ class WikidataCityParser:
 
         # Finally add all generated stations to system.
 
+        line_systems: dict[int, System] = self.map.get_line_systems()
+
         for station_item in station_items.values():
             for station in station_item.get_stations():
                 station.recompute()
-                line = station.line
-                station_system = None
-                for system in self.map.systems.values():
-                    if line in system.lines.values():
-                        station_system = system
+                station_system: System | None = line_systems.get(
+                    id(station.line)
+                )
                 if station_system:
-                    station_system.stations[station.id_] = station
+                    station_system.add_station(station)
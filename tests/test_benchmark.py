@@ -0,0 +1,132 @@
+"""Test crawl against the local mock Wikidata server."""
+
+from __future__ import annotations
+
+from metro.harvest import mock_server
+from metro.harvest.benchmark import BenchmarkResult, run_benchmark
+from metro.harvest.mock_server import MockWikidataServer
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+# High enough not to throttle the crawl in tests.
+RATE: float = 1000.0
+
+
+def run(**settings: float) -> BenchmarkResult:
+    """Crawl generated system with 2 lines of 5 stations."""
+
+    server: MockWikidataServer = MockWikidataServer(
+        mock_server.generate_network(2, 5), seed=0, **settings
+    )
+    server.start()
+    try:
+        return run_benchmark(
+            server,
+            mock_server.SYSTEM_ID,
+            [mock_server.FIRST_STATION_ID],
+            concurrency=2,
+            rate=RATE,
+            burst=10,
+        )
+    finally:
+        server.stop()
+
+
+def test_benchmark() -> None:
+    """Test that the whole generated system is crawled."""
+
+    result: BenchmarkResult = run()
+    assert result.items == 12  # noqa: PLR2004
+    assert result.requests > 0
+    assert result.get_items_per_second() > 0
+
+
+def test_server_errors() -> None:
+    """Test that the crawl does not fail if the server fails."""
+
+    result: BenchmarkResult = run(error_rate=1.0)
+    assert result.items == 0
+    assert result.requests > 0
+
+
+def test_projected_entities() -> None:
+    """Test that the server filters names and site links by language."""
+
+    server: MockWikidataServer = MockWikidataServer(
+        mock_server.generate_network(2, 5)
+    )
+    entity: dict = server.get_entities(
+        {
+            "ids": mock_server.get_item_id(mock_server.SYSTEM_ID),
+            "props": "labels|sitelinks",
+            "languages": "de",
+            "sitefilter": "dewiki",
+        }
+    )["entities"]["Q1"]
+    assert entity["labels"] == {}
+    assert list(entity["sitelinks"]) == ["dewiki"]
+    assert "claims" not in entity
+
+    server.start()
+    try:
+        result: BenchmarkResult = run_benchmark(
+            server,
+            mock_server.SYSTEM_ID,
+            [mock_server.FIRST_STATION_ID],
+            rate=RATE,
+            languages=["en"],
+        )
+    finally:
+        server.stop()
+    assert result.items == 12  # noqa: PLR2004
+
+
+def test_concurrent_speedup() -> None:
+    """Test that concurrent crawl is faster and does not request more."""
+
+    lines: int = 4
+    stations: int = 50
+    all_stations: list[int] = list(
+        range(
+            mock_server.FIRST_STATION_ID,
+            mock_server.FIRST_STATION_ID + lines * stations,
+        )
+    )
+    results: dict[tuple[int, int | None], BenchmarkResult] = {}
+
+    # Start from one station, so that the frontier is small, and from all
+    # stations, so that it is larger than one batch.  Only the latter is
+    # timed, so only its server is slow.
+    start: list[int]
+    for start, latency in (
+        ([mock_server.FIRST_STATION_ID], 0.0),
+        (all_stations, 0.1),
+    ):
+        server: MockWikidataServer = MockWikidataServer(
+            mock_server.generate_network(lines, stations), latency=latency
+        )
+        server.start()
+        try:
+            for concurrency in None, 4:
+                results[len(start), concurrency] = run_benchmark(
+                    server,
+                    mock_server.SYSTEM_ID,
+                    start,
+                    concurrency=concurrency,
+                    rate=RATE,
+                    burst=10,
+                )
+        finally:
+            server.stop()
+
+    for start_count in 1, len(all_stations):
+        sequential: BenchmarkResult = results[start_count, None]
+        concurrent: BenchmarkResult = results[start_count, 4]
+        assert sequential.items == concurrent.items == lines * (stations + 1)
+        assert concurrent.requests <= sequential.requests
+
+    assert (
+        results[len(all_stations), 4].wall_time
+        < results[len(all_stations), None].wall_time
+    )
@@ -0,0 +1,209 @@
+"""Test on-disk cache."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+import pytest
+
+from metro.core import cache as cache_module
+from metro.core.cache import (
+    Cache,
+    CacheStats,
+    FileCache,
+    SQLiteCache,
+    create_cache,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+
+def test_file_cache(tmp_path: Path) -> None:
+    """Test that entries are stored compressed in shard directories."""
+
+    cache: FileCache = FileCache(tmp_path)
+    cache.write("Q12345", b"content")
+
+    assert (tmp_path / "12" / "Q12345.gz").exists()
+    assert cache.read("Q12345") == b"content"
+    assert cache.read("Q1") is None
+    assert list(cache.keys()) == ["Q12345"]
+
+
+def test_concurrent_writes(tmp_path: Path) -> None:
+    """Test that the same entry may be written by several threads at once."""
+
+    cache: FileCache = FileCache(tmp_path)
+    contents: list[bytes] = [str(x).encode() * 1000 for x in range(8)]
+
+    def write(content: bytes) -> None:
+        for _ in range(20):
+            cache.write("Q1", content)
+
+    with ThreadPoolExecutor(max_workers=len(contents)) as executor:
+        list(executor.map(write, contents))
+
+    assert cache.read("Q1") in contents
+    assert [x.name for x in (tmp_path / "1").iterdir()] == ["Q1.gz"]
+
+
+def test_legacy_file_cache(tmp_path: Path) -> None:
+    """Test reading and migration of legacy uncompressed entries."""
+
+    (tmp_path / "Q1").write_bytes(b"legacy")
+    # Other files of the cache directory are not entries.
+    (tmp_path / "cache.sqlite").write_bytes(b"database")
+    (tmp_path / "checkpoint_1.json").write_bytes(b"{}")
+    cache: FileCache = FileCache(tmp_path)
+
+    assert cache.read("Q1") == b"legacy"
+    assert list(cache.keys()) == ["Q1"]
+    assert cache.migrate() == 1
+    assert not (tmp_path / "Q1").exists()
+    assert cache.read("Q1") == b"legacy"
+    assert (tmp_path / "cache.sqlite").read_bytes() == b"database"
+    assert (tmp_path / "checkpoint_1.json").exists()
+
+
+def test_sqlite_cache(tmp_path: Path) -> None:
+    """Test SQLite cache."""
+
+    cache: SQLiteCache = SQLiteCache(tmp_path / "cache.sqlite")
+    cache.write("Q1", b"first", 10)
+    cache.write("Q2", b"second")
+    cache.write("Q1", b"first again", 11)
+
+    assert cache.read("Q1") == b"first again"
+    assert cache.read_many(["Q1", "Q2", "Q3"]) == {
+        "Q1": b"first again",
+        "Q2": b"second",
+    }
+    assert cache.read_revisions(["Q1", "Q2", "Q3"]) == {"Q1": 11}
+    assert FileCache(tmp_path).read_revisions(["Q1"]) == {}
+    cache.delete("Q2")
+    assert not cache.contains("Q2")
+    assert list(cache.keys()) == ["Q1"]
+    cache.close()
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_touch(
+    backend: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that touched entries are not expired."""
+
+    now: float = time.time()
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: now))
+
+    cache: Cache = create_cache(backend, tmp_path, max_age=60)
+    cache.write("Q1", b"first")
+    cache.write("Q2", b"second")
+    now += 100
+    cache.touch(["Q1", "Q3"])
+    now += 50
+
+    assert cache.evict() == 1
+    assert list(cache.keys()) == ["Q1"]
+
+
+def test_sqlite_access_time(tmp_path: Path) -> None:
+    """Test that reading entries writes their old access times at once."""
+
+    path: Path = tmp_path / "cache.sqlite"
+    cache: SQLiteCache = SQLiteCache(path)
+    cache.write("Q1", b"first")
+    cache.write("Q2", b"second")
+    with cache.connection:
+        cache.connection.execute("UPDATE entries SET accessed = 0")
+
+    def get_access_times() -> dict[str, float]:
+        connection: sqlite3.Connection = sqlite3.connect(path)
+        access_times: dict[str, float] = dict(
+            connection.execute("SELECT id, accessed FROM entries")
+        )
+        connection.close()
+        return access_times
+
+    cache.read("Q1")
+    assert get_access_times() == {"Q1": 0, "Q2": 0}
+    assert list(cache.access_times) == ["Q1"]
+
+    # Listing entries for eviction writes access times.
+    assert {x[0]: x[3] > 0 for x in cache.get_entries()} == {
+        "Q1": True,
+        "Q2": False,
+    }
+    assert get_access_times()["Q1"] > 0
+
+    # Recent access time is not updated.
+    cache.read("Q1")
+    assert not cache.access_times
+    cache.close()
+
+
+def test_eviction(tmp_path: Path) -> None:
+    """Test that least recently read entries are evicted except pinned ones."""
+
+    cache: FileCache = FileCache(tmp_path, pinned=["Q1"])
+    for index, key in enumerate(["Q1", "Q2", "Q3", "Q4"]):
+        cache.write(key, key.encode() * 1000)
+        os.utime(cache.get_path(key), (index, index))
+    cache.read("Q2")
+    cache.read("Q5")
+
+    assert cache.stats.get_hit_ratio() == 0.5  # noqa: PLR2004
+
+    _, size = cache.get_size()
+    cache.max_bytes = size - 1
+
+    assert cache.evict() == 1
+    assert sorted(cache.keys()) == ["Q1", "Q2", "Q4"]
+
+    # All entries are expired, but the pinned one.
+    cache.max_age = 1
+    assert cache.evict() == 2  # noqa: PLR2004
+    assert list(cache.keys()) == ["Q1"]
+    assert cache.stats.evicted == 3  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_stored_stats(backend: str, tmp_path: Path) -> None:
+    """Test that statistics of all runs are available to other runs."""
+
+    for _ in range(2):
+        cache: Cache = create_cache(backend, tmp_path, max_age=0)
+        cache.write("Q1", b"content")
+        cache.read_many(["Q1", "Q2"])
+        cache.evict()
+        cache.save_stats()
+        assert cache.stats == CacheStats()
+
+    assert create_cache(backend, tmp_path).get_total_stats() == CacheStats(
+        hits=2, misses=2, evicted=2
+    )
+
+
+def test_sqlite_close(tmp_path: Path) -> None:
+    """Test that closing the cache writes kept access times."""
+
+    path: Path = tmp_path / "cache.sqlite"
+    with SQLiteCache(path) as cache:
+        cache.write("Q1", b"first")
+        with cache.connection:
+            cache.connection.execute("UPDATE entries SET accessed = 0")
+        cache.read("Q1")
+        assert cache.access_times
+
+    connection: sqlite3.Connection = sqlite3.connect(path)
+    ((accessed,),) = connection.execute("SELECT accessed FROM entries")
+    connection.close()
+    assert accessed > 0
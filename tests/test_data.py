@@ -1,6 +1,10 @@
 """Test data manipulation."""
 
-from metro.core.data import extract_line_name, extract_station_name
+from metro.core.data import (
+    NamePatterns,
+    extract_line_name,
+    extract_station_name,
+)
 
 __author__ = "Sergey Vartanov"
 __email__ = "me@enzet.ru"
@@ -102,3 +106,15 @@ def test_data_lines() -> None:
         for test in lines[language]:
             parsed = extract_line_name(test[0], language)
             assert parsed == test[1]
+
+
+def test_register_patterns() -> None:
+    """Test that patterns registered at runtime are used."""
+
+    patterns: NamePatterns = NamePatterns({"en": ["^(?P<name>.*) [Ll]ine$"]})
+    assert patterns.extract("Linha Azul", "pt") == "Linha Azul"
+    assert patterns.extract("Red Line", "en") == "Red"
+
+    patterns.register("pt", ["^Linha (?P<name>.*)$"])
+    assert patterns.extract("Linha Azul", "pt") == "Azul"
+    assert patterns.patterns["pt"] == ["^Linha (?P<name>.*)$"]
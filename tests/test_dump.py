@@ -0,0 +1,158 @@
+"""Test Wikidata dump ingestion."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+from typing import TYPE_CHECKING
+
+import pytest
+
+from metro.core import network
+from metro.core.system import Map, System
+from metro.harvest import dump
+from metro.harvest.dump import DumpFilter, filter_dump, ingest_dump
+from metro.harvest.wikidata import WikidataCityParser, WikidataParser
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+
+def claim(property_: str, *ids: int) -> dict:
+    """Create claims with item values."""
+    return {
+        property_: [
+            {
+                "mainsnak": {
+                    "datavalue": {"value": {"id": f"Q{x}", "numeric-id": x}}
+                }
+            }
+            for x in ids
+        ]
+    }
+
+
+def entity(wikidata_id: int, name: str, claims: dict | list) -> dict:
+    """Create Wikidata entity."""
+    return {
+        "id": f"Q{wikidata_id}",
+        "labels": {"en": {"language": "en", "value": name}},
+        "claims": claims,
+    }
+
+
+ENTITIES: list[dict] = [
+    # Dumps write empty maps as empty lists.
+    entity(1, "Metro", []) | {"sitelinks": []},
+    entity(5, "Somebody", claim("P31", 5)),
+    entity(10, "Red Line", claim("P361", 1)),
+    entity(11, "Blue Line", claim("P361", 2)) | {"aliases": []},
+    entity(100, "Alpha", claim("P81", 10) | claim("P197", 101)),
+    entity(101, "Beta", claim("P81", 10, 11) | claim("P197", 100)),
+]
+
+
+def write_dump(path: Path) -> None:
+    """Write entities as Wikidata JSON dump."""
+
+    with gzip.open(path, "wb") as output_file:
+        output_file.write(b"[\n")
+        output_file.write(b",\n".join(json.dumps(x).encode() for x in ENTITIES))
+        output_file.write(b"\n]\n")
+
+
+def test_ingest_dump(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that system is parsed from the dump without network requests."""
+
+    dump_path: Path = tmp_path / "latest-all.json.gz"
+    write_dump(dump_path)
+
+    wikidata_parser: WikidataParser = WikidataParser(tmp_path / "cache")
+    assert ingest_dump(dump_path, wikidata_parser, [1]) == 5  # noqa: PLR2004
+    assert sorted(wikidata_parser.cache.keys()) == [
+        "Q1",
+        "Q10",
+        "Q100",
+        "Q101",
+        "Q11",
+    ]
+    assert wikidata_parser.parse_wikidata(1)["entities"]["Q1"]["claims"] == {}
+
+    def get(*_: object, **__: object) -> bytes:
+        message: str = "unexpected network request"
+        raise AssertionError(message)
+
+    monkeypatch.setattr(network, "get", get)
+
+    map_: Map = Map("test_map", systems={"metro": System({}, "metro")})
+    WikidataCityParser(
+        wikidata_parser=wikidata_parser,
+        map_=map_,
+        systems_dict={1: "metro"},
+        wikidata_init_ids=[100],
+        wikidata_id=1,
+        network_update=[],
+    ).parse()
+
+    assert sorted(map_.systems["metro"].stations) == [
+        "Red/Alpha",
+        "Red/Beta",
+    ]
+
+
+def test_ingest_dump_in_parallel(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that worker processes give the same cache contents."""
+
+    dump_path: Path = tmp_path / "latest-all.json.gz"
+    write_dump(dump_path)
+    monkeypatch.setattr(dump, "CHUNK_SIZE", 2)
+
+    caches: list[dict[str, bytes]] = []
+    for workers in 1, 3:
+        wikidata_parser: WikidataParser = WikidataParser(
+            tmp_path / f"cache_{workers}"
+        )
+        ingest_dump(dump_path, wikidata_parser, [1], workers)
+        caches.append(
+            wikidata_parser.cache.read_many(wikidata_parser.cache.keys())
+        )
+
+    assert caches[0] == caches[1]
+    assert len(caches[0]) == 5  # noqa: PLR2004
+
+
+def test_markers() -> None:
+    """Test that only wanted entities are decoded on the second pass."""
+
+    assert dump.DumpFilter(wanted=frozenset({11})).get_markers() == [b'"Q11"']
+    assert b'"Q928830"' in dump.DumpFilter(frozenset({1})).get_markers()
+
+
+def test_filter_dump_progress(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that progress is logged for all chunks with any workers."""
+
+    monkeypatch.setattr(dump, "CHUNK_SIZE", 1)
+    monkeypatch.setattr(dump, "PROGRESS_STEP", 1)
+    lines: list[bytes] = [json.dumps(x).encode() for x in ENTITIES]
+    dump_filter: DumpFilter = DumpFilter(frozenset({1}))
+
+    messages: list[list[str]] = []
+    for workers in 1, 2:
+        caplog.clear()
+        with caplog.at_level(logging.INFO):
+            list(filter_dump(lines, dump_filter, workers))
+        messages.append([x.getMessage() for x in caplog.records])
+
+    assert messages[0] == messages[1]
+    assert len(messages[0]) == len(ENTITIES) - 1
+
+    with pytest.raises(ValueError, match="workers"):
+        list(filter_dump(lines, dump_filter, 0))
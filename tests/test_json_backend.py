@@ -0,0 +1,47 @@
+"""Test JSON backend."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from metro.core import json_backend
+from metro.core.system import System
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+VALUE: dict = {"id": "Q1", "labels": {"ru": "Метро"}, "values": [1, 2.5, None]}
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_backend(backend: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that backends give the same values."""
+
+    if backend == "orjson" and json_backend.orjson is None:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(json_backend, "backend", backend)
+
+    content: bytes = json_backend.dumps(VALUE)
+    assert b" " not in content
+    assert json_backend.loads(content) == VALUE
+    assert json.loads(content) == VALUE
+    assert json_backend.dumps(VALUE, pretty=True) == (
+        json.dumps(VALUE, indent=4, ensure_ascii=False).encode()
+    )
+
+
+def test_system(tmp_path: Path) -> None:
+    """Test that transport system is read from the written file."""
+
+    system: System = System({}, "metro", line_width=2.0)
+    system.write(tmp_path / "metro.json", pretty=False)
+
+    read_system: System = System({}, "")
+    read_system.read(tmp_path / "metro.json")
+    assert read_system.serialize() == system.serialize()
@@ -0,0 +1,105 @@
+"""Test network utility."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from metro.core import network
+from metro.core.network import RateLimiter, Session
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+
+@dataclass
+class Clock:
+    """Fake clock that moves only when somebody sleeps."""
+
+    time: float = 0.0
+    sleeps: list[float] = field(default_factory=list)
+
+    def __call__(self) -> float:
+        """Get current time."""
+        return self.time
+
+    def sleep(self, seconds: float) -> None:
+        """Move the clock forward."""
+        self.sleeps.append(seconds)
+        self.time += seconds
+
+
+@dataclass
+class Response:
+    """Fake HTTP response."""
+
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)
+    data: bytes = b""
+
+
+@dataclass
+class Pool:
+    """Fake connection pool that returns prepared responses."""
+
+    responses: list[Response]
+
+    def request(self, *_: object) -> Response:
+        """Return the next prepared response."""
+        return self.responses.pop(0)
+
+
+def test_rate_limiter() -> None:
+    """Test that requests are spread according to the rate and burst."""
+
+    clock: Clock = Clock()
+    rate_limiter: RateLimiter = RateLimiter(
+        rate=2.0, burst=2, clock=clock, sleep=clock.sleep
+    )
+    for _ in range(4):
+        rate_limiter.acquire()
+
+    assert clock.sleeps == [0.5, 0.5]
+    assert rate_limiter.throttled_time == 1.0
+
+    rate_limiter.back_off(3.0)
+    rate_limiter.acquire()
+
+    assert clock.sleeps[-1] == 3.0  # noqa: PLR2004
+
+
+def test_retry_after() -> None:
+    """Test that session retries throttled requests after requested time."""
+
+    clock: Clock = Clock()
+    session: Session = Session(
+        rate_limiter=RateLimiter(
+            rate=10.0, burst=1, clock=clock, sleep=clock.sleep
+        )
+    )
+    session.pool = Pool(
+        [
+            Response(429, {"Retry-After": "2"}),
+            Response(200, {"MediaWiki-API-Error": "maxlag"}),
+            Response(200, data=b"{}"),
+        ]
+    )
+    response: Response = session.request("localhost", {})
+
+    assert response.data == b"{}"
+    assert clock.sleeps == [2.0, 1.0]
+    assert session.rate_limiter.request_count == 3  # noqa: PLR2004
+
+
+def test_failed_request() -> None:
+    """Test that error responses are not returned as data."""
+
+    session: Session = Session(rate_limiter=RateLimiter(rate=10.0))
+    assert not session.pool.connection_pool_kw[
+        "retries"
+    ].respect_retry_after_header
+
+    session.pool = Pool(
+        [Response(500, data=b"error"), Response(404, data=b"missing")]
+    )
+    assert network.get("localhost", {}, session=session) is None
+    assert network.get("localhost", {}, session=session) is None
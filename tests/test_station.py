@@ -0,0 +1,61 @@
+"""Test transport station."""
+
+from metro.core.station import Connection, ConnectionType, Station
+from metro.core.system import System
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+
+def test_connections() -> None:
+    """Test that connections are found by station identity and kept ordered."""
+
+    station: Station = Station({}, "metro/a")
+    first: Station = Station({}, "metro/b")
+    same_first: Station = Station({}, "metro/b")
+    second: Station = Station({}, "metro/c")
+
+    station.add_connection(first, ConnectionType.NEXT)
+    station.add_connection(second, ConnectionType.NEXT)
+    station.add_connection(first, ConnectionType.TRANSITION)
+
+    assert [x.to_ for x in station.connections] == [first, second]
+    assert station.get_connection(first).type_ == ConnectionType.TRANSITION
+    assert station.get_connection(same_first) is None
+
+    assert station.remove_connection(same_first) == 0
+    assert station.remove_connection(first) == 1
+    assert station.get_connection(first) is None
+    assert [x.to_ for x in station.connections] == [second]
+
+    # Connections passed to the constructor may repeat, the first one wins.
+    indexed: Station = Station(
+        {},
+        "metro/d",
+        connections=[
+            Connection(second, ConnectionType.SAME),
+            Connection(second, ConnectionType.NEXT),
+        ],
+    )
+    assert indexed.get_connection(second).type_ == ConnectionType.SAME
+    assert indexed.remove_connection(second) == 2  # noqa: PLR2004
+    assert indexed.connections == []
+
+
+def test_deserialize_connections() -> None:
+    """Test that deserialized connections are indexed."""
+
+    system: System = System({}, "metro")
+    system.deserialize(
+        {
+            "stations": [
+                {
+                    "id": "metro/a",
+                    "connections": [{"to": "metro/b", "type": "next"}],
+                },
+                {"id": "metro/b"},
+            ]
+        }
+    )
+    station: Station = system.stations["metro/a"]
+    assert station.get_connection(system.stations["metro/b"]) is not None
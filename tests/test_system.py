@@ -0,0 +1,160 @@
+"""Test transport system."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+
+from metro.core.graph import SystemArrays
+from metro.core.line import Line
+from metro.core.station import ConnectionType, Station
+from metro.core.system import Map, System
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+__author__ = "Sergey Vartanov"
+__email__ = "me@enzet.ru"
+
+
+def test_line_systems() -> None:
+    """Test that lines are found by identity and the last system wins."""
+
+    red: Line = Line({}, "Red")
+    same_red: Line = Line({}, "Red")
+    first: System = System({}, "first", lines={"Red": red})
+    second: System = System({}, "second")
+    map_: Map = Map("test_map", systems={"first": first, "second": second})
+
+    assert first.has_line(red)
+    assert not first.has_line(same_red)
+    assert map_.get_line_systems() == {id(red): first}
+
+    second.add_line(red)
+    assert map_.get_line_systems() == {id(red): second}
+
+    first.add_line(same_red)
+    assert not first.has_line(red)
+    assert first.lines == {"Red": same_red}
+
+
+def test_station_indexes() -> None:
+    """Test that stations are found through indexes after changes."""
+
+    red: Line = Line({}, "Red")
+    blue: Line = Line({}, "Blue")
+    first: Station = Station({"en": "Central"}, "metro/central", line=red)
+    first.wikidata_id = 1
+    second: Station = Station({"en": "Central"}, "metro/central_2", line=blue)
+    second.wikidata_id = 1
+    system: System = System(
+        {}, "metro", stations={"metro/central": first}, lines={"Red": red}
+    )
+    system.add_line(blue)
+    system.add_station(second)
+
+    assert system.get_station_by_wikidata_id(1) is first
+    assert system.get_station_by_line_and_wid("Blue", 1) is second
+    assert system.get_stations_by_short_id("central") == [first]
+    assert system.get_stations_by_line(blue) == [second]
+    assert system.get_stations_by_name("Central", "en") == [first, second]
+    assert system.lookup_station_id["metro___central"] is first
+
+    system.remove_station(first)
+    assert system.get_station_by_wikidata_id(1) is second
+    assert system.get_station_by_line_and_wid("Red", 1) is None
+    assert system.get_stations_by_short_id("central") == []
+    assert system.get_stations_by_name("Central", "en") == [second]
+
+    replacement: Station = Station({"en": "Park"}, "metro/central_2")
+    system.add_station(replacement)
+    assert system.get_station_by_wikidata_id(1) is None
+    assert system.get_stations_by_name("Central", "en") == []
+    assert system.get_stations_by_name("Park", "en") == [replacement]
+    assert list(system.stations.values()) == [replacement]
+
+
+def test_arrays(tmp_path: Path) -> None:
+    """Test that system graph is exported to arrays and read back."""
+
+    system: System = System({}, "metro")
+    system.deserialize(
+        {
+            "stations": [
+                {
+                    "id": "metro/a",
+                    "geo_position": [55.75, 37.62],
+                    "altitude": -10,
+                    "connections": [
+                        {"to": "metro/b", "type": "next"},
+                        {"to": "metro/c", "type": "transition"},
+                    ],
+                },
+                {
+                    "id": "metro/b",
+                    "connections": [{"to": "metro/a", "type": "next"}],
+                },
+                {"id": "metro/c"},
+            ]
+        }
+    )
+    arrays: SystemArrays = system.to_arrays()
+
+    assert arrays.station_index == {"metro/a": 0, "metro/b": 1, "metro/c": 2}
+    assert arrays.indptr.tolist() == [0, 2, 3, 3]
+    assert arrays.indices.tolist() == [1, 2, 0]
+    assert arrays.get_connection_types(0) == [
+        ConnectionType.NEXT,
+        ConnectionType.TRANSITION,
+    ]
+    assert arrays.get_neighbours(1).tolist() == [0]
+    assert arrays.coordinates[0].tolist() == [55.75, 37.62]
+    assert np.isnan(arrays.coordinates[1]).all()
+    assert arrays.altitudes[0] == -10  # noqa: PLR2004
+
+    arrays.save(tmp_path / "metro.npz")
+    loaded: SystemArrays = SystemArrays.load(tmp_path / "metro.npz")
+    assert loaded.station_index == arrays.station_index
+    assert np.array_equal(loaded.indices, arrays.indices)
+    assert np.array_equal(loaded.types, arrays.types)
+    assert np.array_equal(loaded.altitudes, arrays.altitudes, equal_nan=True)
+
+    # Codes are mapped by type names, so the order of types may change.
+    np.savez_compressed(
+        tmp_path / "reordered.npz",
+        station_ids=arrays.station_ids,
+        indptr=arrays.indptr,
+        indices=arrays.indices,
+        types=np.array([1, 0, 1], dtype=np.uint8),
+        type_names=np.array(["transition", "next", "same"]),
+        coordinates=arrays.coordinates,
+        altitudes=arrays.altitudes,
+    )
+    reordered: SystemArrays = SystemArrays.load(tmp_path / "reordered.npz")
+    assert np.array_equal(reordered.types, arrays.types)
+
+    np.savez_compressed(
+        tmp_path / "unknown.npz",
+        types=arrays.types,
+        type_names=np.array(["next", "transition", "teleport"]),
+    )
+    with pytest.raises(ValueError, match="teleport"):
+        SystemArrays.load(tmp_path / "unknown.npz")
+
+    np.savez_compressed(tmp_path / "unnamed.npz", types=arrays.types)
+    with pytest.raises(ValueError, match="no connection type names"):
+        SystemArrays.load(tmp_path / "unnamed.npz")
+
+
+def test_lazy_numpy() -> None:
+    """Test that systems are used without importing NumPy."""
+
+    code: str = (
+        "import sys; import metro.core.system; "
+        "assert 'numpy' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)  # noqa: S603
@@ -2,24 +2,182 @@
 
 from __future__ import annotations
 
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
+import pytest
+
+from metro.core import data, network
+from metro.core.line import Line
+from metro.core.station import ObjectStatus, Station
 from metro.core.system import Map, System
-from metro.harvest.wikidata import WikidataCityParser, WikidataParser
+from metro.harvest import wikidata
+from metro.harvest.wikidata import (
+    WikidataCityParser,
+    WikidataLineItem,
+    WikidataParser,
+    WikidataStationItem,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
 
+class StaticWikidataParser(WikidataParser):
+    """Wikidata parser that gets generated items instead of requesting them."""
+
+    @staticmethod
+    def get_structure(wikidata_id: int) -> dict | None:  # noqa: ARG004
+        """Get generated structure of Wikidata item."""
+        return None
 
-class MockWikidataParser(WikidataParser):
+    def parse_wikidata_many(
+        self,
+        wikidata_ids: Iterable[int],
+        *,
+        refresh: bool = False,  # noqa: ARG002
+    ) -> dict[int, dict | None]:
+        """Parse several Wikidata items, refreshed items are the same."""
+
+        return {x: self.get_structure(x) for x in wikidata_ids}
+
+
+class MockWikidataParser(StaticWikidataParser):
     """Mock Wikidata parser."""
 
     @staticmethod
-    def parse_wikidata(wikidata_id: int) -> dict | None:
-        """Parse Wikidata item."""
+    def get_structure(wikidata_id: int) -> dict | None:
+        """Get generated structure of Wikidata item."""
 
         if wikidata_id in [1, 2]:
             return {"entities": {f"Q{wikidata_id}": {"claims": {}}}}
         return None
 
 
+FIRST_STATION_ID: int = 100
+END_STATION_ID: int = 160
+
+
+class NetworkWikidataParser(StaticWikidataParser):
+    """Mock Wikidata parser for a system with one line of 60 stations.
+
+    System has identifier 1, line has identifier 10, and stations have
+    identifiers from 100 to 159.
+    """
+
+    @staticmethod
+    def get_structure(wikidata_id: int) -> dict | None:
+        """Get generated structure of Wikidata item."""
+
+        def reference(property_: str, id_: int) -> dict:
+            return {
+                property_: [
+                    {
+                        "mainsnak": {
+                            "datavalue": {
+                                "value": {"id": f"Q{id_}", "numeric-id": id_}
+                            }
+                        }
+                    }
+                ]
+            }
+
+        entity: dict = {}
+        if wikidata_id == 10:  # noqa: PLR2004
+            entity = {
+                "labels": {"en": {"value": "Red Line"}},
+                "claims": reference("P361", 1),
+            }
+        elif FIRST_STATION_ID <= wikidata_id < END_STATION_ID:
+            next_ids: list[int] = [
+                x
+                for x in (wikidata_id - 1, wikidata_id + 1)
+                if FIRST_STATION_ID <= x < END_STATION_ID
+            ]
+            entity = {
+                "labels": {"en": {"value": f"Station {wikidata_id}"}},
+                "claims": reference("P81", 10)
+                | {"P197": [reference("P197", x)["P197"][0] for x in next_ids]},
+            }
+        return {"entities": {f"Q{wikidata_id}": entity}}
+
+
+@dataclass
+class FakeWikidata:
+    """Fake Wikidata API that serves generated entities and records requests.
+
+    It replaces `network.get`, see `fake_wikidata`.
+    """
+
+    # Entities mapped from identifiers, e.g. `Q1`, without `id` key.
+    entities: dict[str, dict] = field(default_factory=dict)
+
+    # Entity of items that are not in `entities`.
+    default: Callable[[str], dict] = lambda _: {"claims": {}}
+
+    # Identifiers of items that redirect to other items.
+    redirects: dict[str, str] = field(default_factory=dict)
+
+    # Time in seconds to wait before responses, so that other threads send
+    # their requests meanwhile.
+    latency: float = 0.0
+
+    # Number of next requests that fail.
+    failures: int = 0
+
+    # Parameters of all requests.
+    requests: list[dict[str, str]] = field(default_factory=list)
+
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def get(
+        self,
+        _address: str,
+        parameters: dict[str, str],
+        *_: object,
+        **__: object,
+    ) -> bytes | None:
+        """Get `wbgetentities` response, `None` if the request fails."""
+
+        with self.lock:
+            self.requests.append(parameters)
+            if self.failures:
+                self.failures -= 1
+                return None
+        time.sleep(self.latency)
+
+        entities: dict[str, dict] = {}
+        for wikidata_id in parameters["ids"].split("|"):
+            key: str = self.redirects.get(wikidata_id, wikidata_id)
+            entity: dict = {"id": key} | self.entities.get(
+                key, self.default(key)
+            )
+            if key != wikidata_id:
+                entity["redirects"] = {"from": wikidata_id, "to": key}
+            if parameters.get("props") == "info":
+                entity = {
+                    x: y
+                    for x, y in entity.items()
+                    if x in ("id", "lastrevid", "redirects")
+                }
+            entities[key] = entity
+        return json.dumps({"entities": entities}).encode()
+
+
+@pytest.fixture()
+def fake_wikidata(monkeypatch: pytest.MonkeyPatch) -> FakeWikidata:
+    """Replace Wikidata API requests with the fake API."""
+
+    fake: FakeWikidata = FakeWikidata()
+    monkeypatch.setattr(network, "get", fake.get)
+    return fake
+
+
 def test_simple() -> None:
     """Test simple case with mock parser."""
 
@@ -38,3 +196,598 @@ def test_simple() -> None:
         network_update=[],
     )
     parser.parse()
+
+
+def test_parse_wikidata_many(
+    tmp_path: Path, fake_wikidata: FakeWikidata
+) -> None:
+    """Test that several items are requested with one request and cached."""
+
+    requests: list[dict[str, str]] = fake_wikidata.requests
+
+    wikidata_parser: WikidataParser = WikidataParser(tmp_path)
+    structures: dict[int, dict | None] = wikidata_parser.parse_wikidata_many(
+        [1, 2, 3]
+    )
+    assert len(requests) == 1
+    assert requests[0]["ids"] == "Q1|Q2|Q3"
+    assert structures[2] == {"entities": {"Q2": {"id": "Q2", "claims": {}}}}
+    assert (tmp_path / "3" / "Q3.gz").exists()
+
+    # Cached items should not be requested again.
+    requests.clear()
+    wikidata_parser.parse_wikidata_many([1, 4])
+    assert [x["ids"] for x in requests] == ["Q4"]
+
+    requests.clear()
+    sqlite_parser: WikidataParser = WikidataParser(
+        tmp_path / "sqlite", cache_backend="sqlite"
+    )
+    sqlite_parser.parse_wikidata_many([1, 2])
+    assert sqlite_parser.parse_wikidata_many([2, 1]) == (
+        wikidata_parser.parse_wikidata_many([2, 1])
+    )
+    assert [x["ids"] for x in requests] == ["Q1|Q2"]
+
+
+def test_languages(tmp_path: Path, fake_wikidata: FakeWikidata) -> None:
+    """Test that only needed entity parts in needed languages are requested."""
+
+    requests: list[dict[str, str]] = fake_wikidata.requests
+
+    wikidata_parser: WikidataParser = WikidataParser(
+        tmp_path, languages=["ru", "en", "ru"]
+    )
+    wikidata_parser.parse_wikidata(1)
+    assert requests[0]["props"] == "info|labels|descriptions|claims|sitelinks"
+    assert requests[0]["languages"] == "en|ru"
+    assert requests[0]["sitefilter"] == "enwiki|ruwiki"
+    assert wikidata_parser.get_cache_key(1) == (
+        f"Q1.{wikidata_parser.projection}"
+    )
+
+    # Full entities are stored under other keys.
+    requests.clear()
+    WikidataParser(tmp_path).parse_wikidata(1)
+    assert len(requests) == 1
+    assert "props" not in requests[0]
+
+    assert wikidata_parser.project(
+        {
+            "id": "Q2",
+            "labels": {"en": "Two", "de": "Zwei"},
+            "aliases": {"en": ["2"]},
+            "sitelinks": {"ruwiki": "Два", "dewiki": "Zwei"},
+        }
+    ) == {"id": "Q2", "labels": {"en": "Two"}, "sitelinks": {"ruwiki": "Два"}}
+
+    # Hyphens of language codes are underscores in site names.
+    old_parser: WikidataParser = WikidataParser(
+        tmp_path, languages=["be-x-old"]
+    )
+    assert old_parser.get_parameters([2])["sitefilter"] == (
+        "be_x_oldwiki|enwiki|ruwiki"
+    )
+    assert old_parser.project(
+        {"sitelinks": {"be_x_oldwiki": "Два", "bewiki": "Два"}}
+    ) == {"sitelinks": {"be_x_oldwiki": "Два"}}
+
+
+def test_slim(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that slim entities keep only claims used by the parser."""
+
+    line_claim: dict = {
+        "mainsnak": {"datavalue": {"value": {"id": "Q10"}}},
+        "qualifiers": {"P582": [{}], "P1545": [{}]},
+        "references": [{}],
+        "rank": "normal",
+    }
+    entity: dict = {
+        "id": "Q1",
+        "claims": {"P81": [line_claim], "P18": [line_claim]},
+    }
+
+    wikidata_parser: WikidataParser = WikidataParser(tmp_path, slim=True)
+    assert wikidata_parser.project(entity)["claims"] == {
+        "P81": [
+            {
+                "mainsnak": {"datavalue": {"value": {"id": "Q10"}}},
+                "qualifiers": {"P582": [{}]},
+                "rank": "normal",
+            }
+        ]
+    }
+    assert wikidata_parser.get_cache_key(1) != "Q1"
+
+    # New properties should invalidate slim entries.
+    projection: str | None = wikidata_parser.projection
+    monkeypatch.setattr(
+        wikidata, "SLIM_PROPERTIES", (*wikidata.SLIM_PROPERTIES, "P18")
+    )
+    assert WikidataParser(tmp_path, slim=True).projection != projection
+
+
+def test_slim_properties() -> None:
+    """Test that slim entries keep claims of all claim handlers."""
+
+    for item_class in WikidataStationItem, WikidataLineItem:
+        assert set(item_class.claim_handlers) <= set(wikidata.SLIM_PROPERTIES)
+
+
+@pytest.mark.usefixtures("fake_wikidata")
+def test_memory(tmp_path: Path) -> None:
+    """Test that decoded structures are kept in memory."""
+
+    WikidataParser(tmp_path).parse_wikidata_many([1, 2, 3])
+
+    wikidata_parser: WikidataParser = WikidataParser(tmp_path, memory_size=2)
+    structure: dict | None = wikidata_parser.parse_wikidata(1)
+    assert wikidata_parser.cache.stats.hits == 1
+    assert wikidata_parser.parse_wikidata(1) is structure
+    assert wikidata_parser.cache.stats.hits == 1
+    assert wikidata_parser.memory_stats.hits == 1
+
+    # The least recently used structure is forgotten.
+    wikidata_parser.parse_wikidata_many([2, 3])
+    assert list(wikidata_parser.memory) == [2, 3]
+    assert wikidata_parser.memory_stats.evicted == 1
+    assert wikidata_parser.parse_wikidata(1) is not structure
+
+
+def test_release() -> None:
+    """Test that released item keeps extracted fields only."""
+
+    structure: dict | None = NetworkWikidataParser.get_structure(130)
+    item: WikidataStationItem = WikidataStationItem(structure, 130)
+    assert not hasattr(item, "__dict__")
+    assert item.line_wikidata_ids == [10]
+
+    item.release()
+    assert item.entity is None
+    assert item.get_name("en") == "Station 130"
+    assert item.site_links == {}
+    with pytest.raises(ValueError, match="released"):
+        _ = item.claims
+
+    # Descriptions are read by the station item, aliases are never read.
+    assert item.descriptions == {}
+    with pytest.raises(ValueError, match="released"):
+        _ = item.aliases
+
+    with pytest.raises(ValueError, match="no entity Q131"):
+        WikidataStationItem(structure, 131)
+    with pytest.raises(ValueError, match="no entity Q130"):
+        WikidataStationItem({}, 130)
+
+
+def test_serialize_wikidata_id() -> None:
+    """Test that harvested stations are written with their Wikidata id."""
+
+    structure: dict | None = NetworkWikidataParser.get_structure(130)
+    station: Station = Station(
+        {}, "metro/station_130", line=Line({}, "metro/line_10")
+    )
+    WikidataStationItem(structure, 130).fill_station(station)
+
+    structure = station.serialize()
+    assert structure["wikidata_id"] == 130  # noqa: PLR2004
+
+    # Written stations are found by Wikidata id after reading them back.
+    system: System = System({}, "metro")
+    system.deserialize(
+        {"lines": [{"id": "metro/line_10"}], "stations": [structure]}
+    )
+    assert system.get_station_by_wikidata_id(130) is not None
+
+
+def test_claim_handlers() -> None:
+    """Test claim extraction order and registration of new handlers."""
+
+    def claim(id_: int) -> dict:
+        return {
+            "mainsnak": {
+                "datavalue": {"value": {"id": f"Q{id_}", "numeric-id": id_}}
+            }
+        }
+
+    structure: dict = {
+        "entities": {
+            "Q10": {
+                "claims": {
+                    # Transport network overrides the system of the line.
+                    "P16": [claim(2)],
+                    "P361": [claim(1)],
+                    "P559": [claim(100)],
+                }
+            }
+        }
+    }
+    assert WikidataLineItem(structure, 10).system_wikidata_id == 2  # noqa: PLR2004
+
+    class TerminusLineItem(WikidataLineItem):
+        __slots__ = ("termini",)
+
+        def __init__(self, structure: dict, wikidata_id: int) -> None:
+            self.termini: list[int] = []
+            super().__init__(structure, wikidata_id)
+
+    def extract_termini(item: TerminusLineItem, claims: list[dict]) -> None:
+        item.termini = [
+            x["mainsnak"]["datavalue"]["value"]["numeric-id"] for x in claims
+        ]
+
+    TerminusLineItem.add_claim_handler("P559", extract_termini)
+    assert TerminusLineItem(structure, 10).termini == [100]
+    assert "P559" not in WikidataLineItem.claim_handlers
+
+
+@pytest.mark.parametrize(
+    ("time", "status"),
+    [
+        ("+1935-05-15T00:00:00Z", {}),
+        ("+2935-05-00T00:00:00Z", {"type": ObjectStatus.UNDER_CONSTRUCTION}),
+    ],
+)
+def test_open_time(time: str, status: dict) -> None:
+    """Test that opening date is extracted and future stations are marked."""
+
+    point: dict = {
+        "time": time,
+        "timezone": 0,
+        "precision": 11,
+        "before": 0,
+        "after": 0,
+    }
+    structure: dict = {
+        "entities": {
+            "Q1": {
+                "claims": {
+                    "P1619": [{"mainsnak": {"datavalue": {"value": point}}}]
+                }
+            }
+        }
+    }
+    item: WikidataStationItem = WikidataStationItem(structure, 1)
+    assert item.open_time.year == int(time[1:5])
+    assert item.status == status
+
+
+def test_update(tmp_path: Path, fake_wikidata: FakeWikidata) -> None:
+    """Test that selected items are requested again and replaced in cache."""
+
+    requests: list[dict[str, str]] = fake_wikidata.requests
+    fake_wikidata.entities["Q1"] = {"labels": {"en": {"value": "Old"}}}
+
+    wikidata_parser: WikidataParser = WikidataParser(tmp_path)
+    wikidata_parser.parse_wikidata(1)
+    fake_wikidata.entities["Q1"] = {"labels": {"en": {"value": "New"}}}
+
+    def get_label(structure: dict | None) -> str:
+        return structure["entities"]["Q1"]["labels"]["en"]["value"]
+
+    assert get_label(wikidata_parser.parse_wikidata(1)) == "Old"
+    assert get_label(wikidata_parser.parse_wikidata(1, refresh=True)) == "New"
+    assert len(requests) == 2  # noqa: PLR2004
+    assert get_label(WikidataParser(tmp_path).parse_wikidata(1)) == "New"
+
+    def is_update_requested(patterns: list[str], wikidata_id: int) -> bool:
+        return WikidataCityParser(
+            wikidata_parser, Map("test_map"), {}, [], 0, patterns
+        ).is_update_requested(
+            WikidataStationItem(
+                NetworkWikidataParser.get_structure(wikidata_id), wikidata_id
+            )
+        )
+
+    assert is_update_requested(["Station 13"], 130)
+    assert not is_update_requested(["Station 13"], 140)
+    assert is_update_requested(["^Q140$"], 140)
+    assert is_update_requested(["^Q10$"], 140)
+    assert not is_update_requested([], 140)
+
+    # Selected stations are requested again during the crawl.
+    map_: Map = Map("test_map", systems={"metro": System({}, "metro")})
+    WikidataCityParser(
+        NetworkWikidataParser(tmp_path), map_, {1: "metro"}, [130], 0, ["^Q13"]
+    ).parse()
+    assert len(map_.systems["metro"].stations) == 60  # noqa: PLR2004
+
+
+def test_language_policy() -> None:
+    """Test that items keep only names and site links of map languages."""
+
+    map_: Map = Map("test_map", local_languages=["ru"], languages=["be-x-old"])
+    structure: dict = {
+        "entities": {
+            "Q1": {
+                "labels": {
+                    "en": {"value": "Arbatskaya"},
+                    "ru": {"value": "Арбатская"},
+                },
+                "sitelinks": {
+                    "ruwiki": {"title": "Арбатская"},
+                    "be_x_oldwiki": {"title": "Арбацкая"},
+                    "commonswiki": {"title": "Arbatskaya"},
+                },
+            }
+        }
+    }
+    item: WikidataStationItem = WikidataStationItem(
+        structure, 1, map_.get_languages()
+    )
+    assert item.get_output_names() == {"ru": "Арбатская"}
+    assert sorted(item.site_links) == ["be_x_oldwiki", "ruwiki"]
+    assert Map("test_map").get_languages() is None
+
+
+def test_parsing_languages() -> None:
+    """Test that items are parsed the same way for any map languages."""
+
+    assert set(WikidataStationItem.type_map) <= wikidata.PARSING_LANGUAGES
+    assert WikidataParser(Path("cache"), languages=["ja"]).languages == [
+        "en",
+        "ja",
+        "ru",
+    ]
+
+    map_: Map = Map("test_map", local_languages=["ja"], languages=[])
+    structure: dict = {
+        "entities": {
+            "Q1": {
+                "labels": {
+                    "en": {"value": "Baker Street"},
+                    "ja": {"value": "ベイカー・ストリート駅"},
+                },
+                "descriptions": {"en": {"value": "planned metro station"}},
+            }
+        }
+    }
+    item: WikidataStationItem = WikidataStationItem(
+        structure, 1, map_.get_languages()
+    )
+    assert item.status == {"type": ObjectStatus.PLANNED}
+    assert data.compute_short_station_id(item.names, ["ja"]) == "Baker Street"
+
+    station: Station = Station({}, "metro/Baker Street")
+    item.fill_station(station)
+    assert station.names == {"ja": "ベイカー・ストリート駅"}
+
+
+def parse_network(concurrency: int | None) -> tuple[Map, WikidataCityParser]:
+    """Parse mock network."""
+
+    map_: Map = Map("test_map", systems={"metro": System({}, "metro")})
+    parser: WikidataCityParser = WikidataCityParser(
+        wikidata_parser=NetworkWikidataParser(cache_directory=Path("cache")),
+        map_=map_,
+        systems_dict={1: "metro"},
+        wikidata_init_ids=[130],
+        wikidata_id=0,
+        network_update=[],
+    )
+    parser.parse(concurrency=concurrency)
+    return map_, parser
+
+
+def test_concurrent_crawl() -> None:
+    """Test that concurrent crawl gives the same result as sequential one."""
+
+    map_, parser = parse_network(None)
+    async_map, async_parser = parse_network(4)
+
+    assert parser.parsed_station_wikidata_ids == set(
+        range(FIRST_STATION_ID, END_STATION_ID)
+    )
+    assert (
+        async_parser.parsed_station_wikidata_ids
+        == parser.parsed_station_wikidata_ids
+    )
+    assert {
+        x["id"]: x for x in async_map.systems["metro"].serialize()["stations"]
+    } == {x["id"]: x for x in map_.systems["metro"].serialize()["stations"]}
+
+
+def test_concurrent_crawl_with_cache(
+    tmp_path: Path, fake_wikidata: FakeWikidata
+) -> None:
+    """Test that one cache is safely shared by concurrent batches.
+
+    All batches request the same line at the same time, and the second crawl
+    revalidates all items from several threads after the line is renamed.
+    """
+    requests: list[dict[str, str]] = fake_wikidata.requests
+    fake_wikidata.latency = 0.01
+
+    maps: list[Map] = []
+    for revision in 1, 2:
+        fake_wikidata.default = lambda x, revision=revision: (
+            NetworkWikidataParser.get_structure(int(x[1:]))["entities"][x]
+            | {"lastrevid": revision}
+        )
+        if revision > 1:
+            fake_wikidata.entities["Q10"] = fake_wikidata.default("Q10") | {
+                "labels": {"en": {"value": "Blue Line"}}
+            }
+        map_: Map = Map("test_map", systems={"metro": System({}, "metro")})
+        WikidataCityParser(
+            wikidata_parser=WikidataParser(tmp_path, revalidate=revision > 1),
+            map_=map_,
+            systems_dict={1: "metro"},
+            wikidata_init_ids=list(range(FIRST_STATION_ID, END_STATION_ID, 5)),
+            wikidata_id=0,
+            network_update=[],
+        ).parse(concurrency=4)
+        maps.append(map_)
+
+    revalidated: list[str] = [
+        y
+        for x in requests
+        if x.get("props") == "info"
+        for y in x["ids"].split("|")
+    ]
+    assert sorted(revalidated) == sorted(set(revalidated))
+    assert "Q10" in revalidated
+    assert {
+        x["id"]: x for x in maps[0].systems["metro"].serialize()["stations"]
+    } == {
+        x["id"]: x
+        for x in parse_network(None)[0].systems["metro"].serialize()["stations"]
+    }
+    assert {x.line.id_ for x in maps[1].systems["metro"].stations.values()} == {
+        "Blue"
+    }
+
+
+class FailingWikidataParser(NetworkWikidataParser):
+    """Mock Wikidata parser that cannot request station 140."""
+
+    @staticmethod
+    def get_structure(wikidata_id: int) -> dict | None:
+        """Get generated structure of Wikidata item, except station 140."""
+
+        if wikidata_id == 140:  # noqa: PLR2004
+            return None
+        return NetworkWikidataParser.get_structure(wikidata_id)
+
+
+def test_resume(tmp_path: Path) -> None:
+    """Test that interrupted crawl is continued from the checkpoint."""
+
+    checkpoint_path: Path = tmp_path / "checkpoint.json"
+    maps: list[Map] = []
+
+    for parser_class in FailingWikidataParser, NetworkWikidataParser:
+        map_: Map = Map("test_map", systems={"metro": System({}, "metro")})
+        parser: WikidataCityParser = WikidataCityParser(
+            wikidata_parser=parser_class(cache_directory=tmp_path),
+            map_=map_,
+            systems_dict={1: "metro"},
+            wikidata_init_ids=[130],
+            wikidata_id=0,
+            network_update=[],
+            checkpoint_path=checkpoint_path,
+        )
+        parser.parse(resume=True)
+        maps.append(map_)
+
+        if parser_class is FailingWikidataParser:
+            assert parser.failed_station_wikidata_ids == {140}
+            assert checkpoint_path.exists()
+
+    # Stations after 140 are reachable only after resume.
+    assert not checkpoint_path.exists()
+    assert len(maps[0].systems["metro"].stations) == 40  # noqa: PLR2004
+    assert len(maps[1].systems["metro"].stations) == 60  # noqa: PLR2004
+    assert {
+        x["id"]: x for x in maps[1].systems["metro"].serialize()["stations"]
+    } == {
+        x["id"]: x
+        for x in parse_network(None)[0].systems["metro"].serialize()["stations"]
+    }
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_revalidate(
+    backend: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    fake_wikidata: FakeWikidata,
+) -> None:
+    """Test that only changed items are downloaded again."""
+
+    revisions: dict[str, int] = {"Q1": 10, "Q2": 20, "Q3": 30, "Q5": 50}
+    fake_wikidata.default = lambda x: {"lastrevid": revisions[x], "claims": {}}
+    # Item 4 is redirected to item 5.
+    fake_wikidata.redirects = {"Q4": "Q5"}
+    requests: list[dict[str, str]] = fake_wikidata.requests
+
+    WikidataParser(tmp_path, cache_backend=backend).parse_wikidata_many(
+        [1, 2, 3, 4]
+    )
+    revisions["Q2"] = 21
+
+    requests.clear()
+    wikidata_parser: WikidataParser = WikidataParser(
+        tmp_path, cache_backend=backend, revalidate=True
+    )
+    touched: list[str] = []
+    monkeypatch.setattr(wikidata_parser.cache, "touch", touched.extend)
+    structures: dict[int, dict | None] = wikidata_parser.parse_wikidata_many(
+        [1, 2, 3, 4]
+    )
+    # Redirected item is up to date.
+    assert [(x.get("props"), x["ids"]) for x in requests] == [
+        ("info", "Q1|Q2|Q3|Q4"),
+        (None, "Q2"),
+    ]
+    assert structures[4]["entities"]["Q4"]["id"] == "Q5"
+    assert touched == ["Q1", "Q3", "Q4"]
+
+    # SQLite cache stores revisions, so entries are not read to get them.
+    assert wikidata_parser.cache.stats.hits == (3 if backend == "sqlite" else 7)
+    assert structures[2]["entities"]["Q2"]["lastrevid"] == 21  # noqa: PLR2004
+
+    # Items should be revalidated only once.
+    requests.clear()
+    wikidata_parser.parse_wikidata_many([1, 2, 3, 4])
+    assert not requests
+
+
+def test_revalidate_failure(
+    tmp_path: Path, fake_wikidata: FakeWikidata
+) -> None:
+    """Test that items are checked again if revisions cannot be requested."""
+
+    revisions: dict[str, int] = {"Q1": 10}
+    fake_wikidata.default = lambda x: {"lastrevid": revisions[x], "claims": {}}
+    WikidataParser(tmp_path).parse_wikidata_many([1])
+    revisions["Q1"] = 11
+
+    wikidata_parser: WikidataParser = WikidataParser(tmp_path, revalidate=True)
+    fake_wikidata.failures = 1
+    structures: dict[int, dict | None] = wikidata_parser.parse_wikidata_many(
+        [1]
+    )
+    # Cached item is used if its revision is unknown.
+    assert structures[1]["entities"]["Q1"]["lastrevid"] == 10  # noqa: PLR2004
+    assert not wikidata_parser.revalidated_wikidata_ids
+
+    structures = wikidata_parser.parse_wikidata_many([1])
+    assert structures[1]["entities"]["Q1"]["lastrevid"] == 11  # noqa: PLR2004
+    assert wikidata_parser.revalidated_wikidata_ids == {1}
+
+
+def test_cache_access_time(tmp_path: Path, fake_wikidata: FakeWikidata) -> None:
+    """Test that access times of cached items are kept after a crawl."""
+
+    fake_wikidata.entities = {
+        "Q1": {"claims": {}},
+        "Q2": {"labels": {"en": {"language": "en", "value": "Station"}}},
+    }
+    path: Path = tmp_path / "cache.sqlite"
+
+    for _ in range(2):
+        wikidata_parser: WikidataParser = WikidataParser(
+            tmp_path, cache_backend="sqlite"
+        )
+        with wikidata_parser.cache:
+            WikidataCityParser(
+                wikidata_parser,
+                Map("metro", {}, {"metro": System({}, "metro")}),
+                {1: "metro"},
+                [2],
+                1,
+                [],
+            ).parse()
+
+        connection: sqlite3.Connection = sqlite3.connect(path)
+        with connection:
+            access_times: list[float] = [
+                x for (x,) in connection.execute("SELECT accessed FROM entries")
+            ]
+            connection.execute("UPDATE entries SET accessed = 0")
+        connection.close()
+
+    # Second crawl reads all items from the cache.
+    assert access_times
+    assert all(x > 0 for x in access_times)